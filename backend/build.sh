@@ -10,3 +10,6 @@ python manage.py collectstatic --no-input
 
 # Run migrations
 python manage.py migrate
+
+# Create the table for the database cache backend (no-op for other backends)
+python manage.py createcachetable
@@ -0,0 +1,86 @@
+"""
+Batched cart mutations for POST /api/cart/<user_id>/batch/.
+
+The operations are applied in order to an in-memory copy of the cart's
+lines. Stock is then checked for every line that grew (variant lines
+against the variant's stock, other lines against the product's stock by
+total volume), so the error can name the operation, and the result is
+written with one delete, one bulk_update and one bulk_create. Reading takes
+three queries (lines, products, variants) whatever the number of
+operations. The view then updates the cart's reservations, which also
+accounts for stock held by other carts (orders/reservations.py).
+"""
+from django.db.models import Prefetch
+
+from products.models import Product, ProductVariant
+from .models import CartItem
+
+
+class CartBatchError(Exception):
+    def __init__(self, index, message):
+        super().__init__(message)
+        self.index = index
+
+
+def apply_cart_operations(cart, user, operations):
+    """Apply validated ``CartOperationSerializer`` data to ``cart``; raises CartBatchError."""
+    lines = {item.id: item for item in CartItem.objects.filter(cart=cart)}
+    original = {item.id: item.quantity for item in lines.values()}
+
+    product_ids = {op['product_id'] for op in operations if op['op'] == 'add'}
+    product_ids |= {lines[op['item_id']].product_id for op in operations if op['op'] == 'update' and op['item_id'] in lines}
+    products = Product.objects.filter(id__in=product_ids).prefetch_related(
+        Prefetch('variants', queryset=ProductVariant.objects.order_by('id'))
+    ).in_bulk()
+    for item in lines.values():
+        if item.product_id in products:
+            item.product = products[item.product_id]
+
+    by_key = {(item.product_id, item.unit_value): item for item in lines.values()}
+    grown = {}      # key -> index of the last operation growing that line
+    removed = set()
+
+    for index, op in enumerate(operations):
+        if op['op'] == 'add':
+            product = products.get(op['product_id'])
+            if product is None:
+                raise CartBatchError(index, 'Product not found')
+            if product.vendor_id == user.id:
+                raise CartBatchError(index, 'You cannot add your own product to cart')
+            key = (product.id, op['unit_value'])
+            if key not in by_key:
+                by_key[key] = CartItem(cart=cart, product=product, unit_value=op['unit_value'], quantity=0)
+            by_key[key].quantity += op['quantity']
+            grown[key] = index
+            continue
+
+        item = lines.get(op['item_id'])
+        if item is None or item.id in removed:
+            raise CartBatchError(index, 'Cart item not found')
+        key = (item.product_id, item.unit_value)
+        if op['op'] == 'remove' or op['quantity'] <= 0:
+            removed.add(item.id)
+            del by_key[key]
+            grown.pop(key, None)
+        else:
+            if op['quantity'] > item.quantity:
+                grown[key] = index
+            item.quantity = op['quantity']
+
+    for key, index in grown.items():
+        item = by_key[key]
+        variant = item.variant
+        if variant:
+            if item.quantity > variant.stock_quantity:
+                raise CartBatchError(index, f'Not enough stock available for this variant. Available: {variant.stock_quantity}')
+        else:
+            volume = sum(line.quantity * line.unit_value for line in by_key.values() if line.product_id == item.product_id)
+            if volume > item.product.stock_quantity:
+                raise CartBatchError(index, 'Not enough stock available')
+
+    if removed:
+        CartItem.objects.filter(id__in=removed).delete()
+    CartItem.objects.bulk_update(
+        [item for item in by_key.values() if item.pk and item.quantity != original[item.pk]], ['quantity']
+    )
+    CartItem.objects.bulk_create([item for item in by_key.values() if item.pk is None])
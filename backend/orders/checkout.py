@@ -0,0 +1,157 @@
+"""
+Set-based checkout for POST /api/orders/<user_id>/place/ and place_direct/.
+
+The cart's lines are loaded with their variants in one query, the order's
+items are written with a single bulk_create and stock is taken with one
+conditional UPDATE per table (orders/stock.py), so the number of queries
+does not depend on the size of the cart. If a line is out of stock
+``OutOfStock`` is raised and the caller's transaction rolls back.
+
+A cart's own reservations (orders/reservations.py) count towards what it
+may take and are released as its stock is taken; other carts' holds are
+not available to it. ``python manage.py stress_checkout`` exercises
+checkout under contention.
+
+Stock rules are the ones checkout always had: a variant line takes its
+count from the variant and (as an approximate total) from the product,
+a standard line takes quantity x unit_value from the product and must fit
+in the product's stock.
+"""
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from products.catalog import catalog_changed
+from products.models import Product, ProductVariant
+from .models import CartItem, OrderItem, variant_subquery
+from .reservations import OutOfStock, negated, release_holds
+from .stock import update_stock
+
+VARIANT_FIELDS = ('id', 'quantity', 'unit', 'price', 'stock_quantity')
+
+# variant is a ProductVariant or None; quantity is a count for variant lines
+CheckoutLine = namedtuple('CheckoutLine', ['product', 'variant', 'quantity', 'unit_value'])
+
+
+def _variant(item):
+    values = {field: getattr(item, f'variant_{field}') for field in VARIANT_FIELDS}
+    for field in ('quantity', 'price', 'stock_quantity'):
+        # SQLite returns annotated decimals unscaled; match what a loaded variant holds
+        places = ProductVariant._meta.get_field(field).decimal_places
+        values[field] = values[field].quantize(Decimal(1).scaleb(-places))
+    return ProductVariant(product=item.product, **values)
+
+
+def cart_lines(cart):
+    """The cart's lines as CheckoutLines, their total price and the CartItem ids, in one query.
+
+    Read with the cart row locked, so the ids are exactly the lines ordered.
+    """
+    items = CartItem.objects.filter(cart=cart).with_line_totals().select_related('product').annotate(
+        **{f'variant_{field}': variant_subquery(field) for field in VARIANT_FIELDS}
+    ).order_by('id')
+
+    lines, total, item_ids = [], Decimal('0'), []
+    for item in items:
+        variant = _variant(item) if item.variant_id is not None else None
+        lines.append(CheckoutLine(item.product, variant, item.quantity, item.unit_value))
+        total += item.line_total
+        item_ids.append(item.id)
+    return lines, total, item_ids
+
+
+def _less(amounts, holds):
+    # What a row must still have available once the cart's own hold on it is counted
+    return {pk: amount - holds.get(pk, Decimal('0')) for pk, amount in amounts.items()}
+
+
+def line_total(line):
+    if line.variant:
+        return line.quantity * line.variant.price
+    return line.quantity * line.unit_value * line.product.price
+
+
+def _shortage(lines, short_variants, short_products):
+    """The error for the first line whose stock was short."""
+    for line in lines:
+        if line.variant and line.variant.id in short_variants:
+            return f"Not enough stock for {line.product.name} ({line.variant.quantity} {line.variant.unit})"
+        if not line.variant and line.product.id in short_products:
+            return f"Not enough stock for {line.product.name}"
+    return f"Not enough stock for {lines[0].product.name}"
+
+
+def place_lines(order, lines, cart=None):
+    """Create the OrderItems for ``lines`` and take their stock; raises OutOfStock.
+
+    With ``cart``, its reservations count as available to it and are
+    released. Must run inside a transaction that rolls back on OutOfStock,
+    ideally as its last write: the stock rows stay locked until the commit.
+    """
+    product_amounts, variant_amounts = defaultdict(Decimal), defaultdict(Decimal)
+    product_required = defaultdict(Decimal)
+    items = []
+    for line in lines:
+        product, variant = line.product, line.variant
+        if variant:
+            variant_amounts[variant.id] += line.quantity
+            product_amounts[product.id] += line.quantity
+            items.append(OrderItem(
+                order=order,
+                product=product,
+                product_name=f"{product.name} ({variant.quantity} {variant.unit})",
+                quantity=line.quantity,
+                price_at_purchase=variant.price,
+            ))
+        else:
+            volume = line.quantity * line.unit_value
+            product_amounts[product.id] += volume
+            product_required[product.id] += volume
+            items.append(OrderItem(
+                order=order,
+                product=product,
+                product_name=product.name,
+                quantity=volume,
+                price_at_purchase=product.price,
+            ))
+
+    OrderItem.objects.bulk_create(items)
+    product_holds, variant_holds = release_holds(cart) if cart is not None else ({}, {})
+    short_variants = update_stock(
+        ProductVariant, taken=variant_amounts, reserved=negated(variant_holds),
+        need=_less(variant_amounts, variant_holds),
+    )
+    short_products = not short_variants and update_stock(
+        Product, taken=product_amounts, reserved=negated(product_holds),
+        need=_less(product_required, product_holds),
+    )
+    if short_variants or short_products:
+        raise OutOfStock(_shortage(lines, short_variants, short_products or {}))
+
+    # update() sends no signals; keep ETags and catalog mirrors in step
+    catalog_changed()
+    return items
+
+
+def restore_lines(items):
+    """Return the stock of a cancelled order's items (the reverse of place_lines).
+
+    Variant lines are recognised by their snapshot name and matched to the
+    variant by ``price_at_purchase``, as cancellations always have been.
+    """
+    items = [item for item in items if item.product is not None]
+    variant_ids = {}
+    for variant in ProductVariant.objects.filter(product__in={item.product_id for item in items}).order_by('id'):
+        variant_ids.setdefault((variant.product_id, variant.price), variant.id)
+
+    product_amounts, variant_amounts = defaultdict(Decimal), defaultdict(Decimal)
+    for item in items:
+        if item.product_name != item.product.name:
+            variant_id = variant_ids.get((item.product_id, item.price_at_purchase))
+            if variant_id is not None:
+                variant_amounts[variant_id] -= item.quantity
+        product_amounts[item.product_id] -= item.quantity
+
+    update_stock(ProductVariant, taken=variant_amounts)
+    update_stock(Product, taken=product_amounts)
+    if product_amounts:
+        catalog_changed()
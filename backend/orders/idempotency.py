@@ -0,0 +1,116 @@
+"""
+``Idempotency-Key`` support for the order-creating endpoints.
+
+A client sends a unique ``Idempotency-Key`` header with a POST and reuses
+it when retrying. The view stores the key with the order it creates
+(``record_key``, in the transaction that creates the order), so the key
+exists exactly when the order does. The response is rendered after the
+commit, like any other, and then stored on the key in a short update. A
+retry is answered from the key with one lookup on the (user, key) unique
+index, without running the checkout again, and carries an
+``Idempotent-Replayed: true`` header. A key whose response was not stored
+yet (the first request is still rendering it, or died after its commit)
+is answered by rendering its order.
+
+A retry that arrives while the first request is still running fails: its
+insert of the key waits on the unique index until the first transaction
+commits (a cart checkout already waits on the cart lock and then finds the
+cart empty). The key is then looked up again and the stored response
+replayed. Failed requests store nothing, so they can be retried with the
+same key. Reusing a key for a different request body gets a 422.
+
+Keys are kept for ``IDEMPOTENCY_KEY_TTL_SECONDS``. Expired keys are
+deleted in bulk by ``python manage.py purge_idempotency_keys``.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+KEY_MAX_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def record_key(request, order):
+    """Store the request's Idempotency-Key, if it has one, for ``order``.
+
+    Call in the transaction that creates ``order``; a concurrent request
+    with the same key fails here once that transaction commits.
+    """
+    pending = getattr(request, 'idempotency_key', None)
+    if pending is not None:
+        request.idempotency_record = IdempotencyKey.objects.create(order=order, **pending)
+
+
+def idempotent(render):
+    """Make a DRF function view (with a ``user_id`` argument) honour ``Idempotency-Key``.
+
+    ``render(order)`` gives the response body for a key whose response was not stored yet.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if key is None:
+                return view(request, *args, **kwargs)
+            if not key or len(key) > KEY_MAX_LENGTH:
+                return Response(
+                    {'error': f'{HEADER} must be 1 to {KEY_MAX_LENGTH} characters'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            user_id = kwargs['user_id']
+            request_fingerprint = fingerprint(request)
+            now = timezone.now()
+            record = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+            if record is not None:
+                if record.expires_at > now:
+                    return _replay(record, request_fingerprint, render)
+                record.delete()
+
+            request.idempotency_key = {
+                'user_id': user_id,
+                'key': key,
+                'fingerprint': request_fingerprint,
+                'expires_at': now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+            }
+            response = view(request, *args, **kwargs)
+            if not status.is_success(response.status_code):
+                # A concurrent request with this key may have won
+                record = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+                return response if record is None else _replay(record, request_fingerprint, render)
+
+            record = getattr(request, 'idempotency_record', None)
+            if record is not None:
+                # After the commit: the stock locks are not held while this runs
+                IdempotencyKey.objects.filter(pk=record.pk).update(
+                    status_code=response.status_code, response=response.data,
+                )
+            return response
+        return wrapper
+    return decorator
+
+
+def _replay(record, request_fingerprint, render):
+    if record.fingerprint != request_fingerprint:
+        return Response(
+            {'error': f'{HEADER} was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record.status_code is None:
+        record.status_code, record.response = status.HTTP_201_CREATED, render(record.order)
+        record.save(update_fields=['status_code', 'response'])
+    return Response(record.response, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
@@ -0,0 +1,32 @@
+"""
+Delete expired idempotency keys.
+
+    python manage.py purge_idempotency_keys
+
+Meant to run from cron. Each batch reads expired keys through the index on
+``expires_at`` and removes them with one DELETE, so a large backlog never
+holds one long transaction. See orders/idempotency.py.
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete expired idempotency keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Keys deleted per statement')
+
+    def handle(self, *args, **options):
+        now, purged = timezone.now(), 0
+        expired = IdempotencyKey.objects.filter(expires_at__lte=now).order_by('expires_at')
+        while True:
+            batch = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+            if batch:
+                IdempotencyKey.objects.filter(pk__in=batch).delete()
+            purged += len(batch)
+            if len(batch) < options['batch_size']:
+                break
+        self.stdout.write(f'Purged {purged} expired idempotency keys')
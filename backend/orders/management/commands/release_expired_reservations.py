@@ -0,0 +1,32 @@
+"""
+Return the stock held by expired cart reservations.
+
+    python manage.py release_expired_reservations
+    python manage.py release_expired_reservations --every 60
+
+Meant to run every minute or so (cron, or ``--every`` in a worker
+process). Each batch reads the oldest expired holds through the index on
+``expires_at``, skipping rows a request has locked, and releases them with
+one UPDATE per table and one DELETE. See orders/reservations.py.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.reservations import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Release expired cart stock reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Reservations released per transaction')
+        parser.add_argument('--every', type=float, default=None, help='Keep running, sweeping every N seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired(batch_size=options['batch_size'])
+            self.stdout.write(f'Released {released} expired reservations')
+            if options['every'] is None:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,185 @@
+"""
+Concurrent checkout load test against the configured Postgres database.
+
+    python manage.py stress_checkout --workers 16 --orders 50 --products 4 --stock 200
+
+Creates a vendor with ``--products`` products of ``--stock`` units each and
+one customer per worker (mobile numbers start with ``stress-``), then
+starts the workers together in threads. Each places ``--orders`` orders
+through the real views as fast as it can: direct orders of 1-3 units of a
+random product, or with ``--cart`` cart checkouts of 1-3 units of up to
+three random products (which also exercises the lock ordering and the
+stock reservations taken when adding to the cart; filling the cart is not
+timed).
+
+Reports throughput, p50/p99 latency, how many orders were accepted and
+rejected for stock, and per product how far the final stock is from the
+initial stock minus what the accepted orders took and how far
+``reserved_quantity`` is from the reservations left. Drift, negative stock
+or any response other than an order or an out-of-stock rejection fails the
+command. Generated rows are removed afterwards unless ``--keep`` is passed.
+"""
+import json
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.test import RequestFactory
+from django.urls import resolve
+
+from orders.models import StockReservation
+from products.models import Product
+from shaaka_backend.db import create_unmanaged_tables
+from users.models import UserProfile
+
+MOBILE_PREFIX = 'stress-'
+
+
+class Command(BaseCommand):
+    help = 'Run concurrent checkouts against shared products and check stock for oversell/drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16, help='Concurrent checkout threads')
+        parser.add_argument('--orders', type=int, default=50, help='Orders per worker')
+        parser.add_argument('--products', type=int, default=4, help='Products competed for')
+        parser.add_argument('--stock', type=int, default=200, help='Initial stock per product')
+        parser.add_argument('--cart', action='store_true', help='Check out carts of several products instead of direct orders')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Keep the generated users, products and orders')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('stress_checkout needs Postgres; SQLite serializes all writers.')
+        create_unmanaged_tables(connection.alias)
+        self._clear()
+
+        vendor = UserProfile.objects.create(
+            full_name='Stress Vendor', mobile_number=f'{MOBILE_PREFIX}v', password_hash='!', category='Vendor',
+        )
+        customers = UserProfile.objects.bulk_create([
+            UserProfile(
+                full_name=f'Stress Customer {i}', mobile_number=f'{MOBILE_PREFIX}c{i}', password_hash='!',
+                category='Customer', address_line='Street 1',
+            )
+            for i in range(options['workers'])
+        ])
+        initial = Decimal(options['stock'])
+        products = [
+            Product.objects.create(
+                vendor=vendor, name=f'Stress Product {i}', description='', category='Others',
+                price=10, unit='kg', stock_quantity=initial,
+            )
+            for i in range(options['products'])
+        ]
+        connection.close()
+
+        results = [None] * len(customers)
+        barrier = threading.Barrier(len(customers))
+        threads = [
+            threading.Thread(target=self._worker, args=(
+                index, customer, products, options, barrier, results, random.Random(options['seed'] + index),
+            ))
+            for index, customer in enumerate(customers)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        timings, statuses, taken = [], Counter(), Counter()
+        for worker_timings, worker_statuses, worker_taken in results:
+            timings += worker_timings
+            statuses.update(worker_statuses)
+            taken.update(worker_taken)
+
+        accepted, rejected = statuses.pop(201, 0), statuses.pop('rejected', 0)
+        add_rejected = statuses.pop('add rejected', 0)
+        p50 = statistics.median(timings) * 1000
+        p99 = statistics.quantiles(timings, n=100)[98] * 1000 if len(timings) > 1 else p50
+        self.stdout.write(
+            f'{len(customers)} workers, {len(timings)} checkouts in {elapsed:.2f} s: '
+            f'{len(timings) / elapsed:.1f} checkouts/s ({accepted / elapsed:.1f} orders/s), '
+            f'p50 {p50:.1f} ms, p99 {p99:.1f} ms'
+        )
+        self.stdout.write(
+            f'accepted {accepted}, rejected for stock {rejected} (at add to cart {add_rejected}), errors {dict(statuses)}'
+        )
+
+        # Anything but an order or an out-of-stock rejection (e.g. a deadlock) is a failure
+        failed = sum(statuses.values())
+        held = dict(
+            StockReservation.objects.filter(product__in=products).values('product')
+            .annotate(total=Sum('quantity')).values_list('product', 'total')
+        )
+        for product in Product.objects.filter(pk__in=[product.pk for product in products]).order_by('pk'):
+            expected = initial - taken[product.pk]
+            drift = product.stock_quantity - expected
+            # The reserved counter must match the reservations still held
+            reserved_drift = product.reserved_quantity - held.get(product.pk, 0)
+            failed += drift != 0 or reserved_drift != 0 or product.stock_quantity < 0
+            self.stdout.write(
+                f'{product.name}: stock {product.stock_quantity} expected {expected} drift {drift}, '
+                f'reserved {product.reserved_quantity} drift {reserved_drift}'
+            )
+
+        if not options['keep']:
+            self._clear()
+        if failed:
+            raise CommandError('Stock drifted, went negative or checkouts failed.')
+        self.stdout.write(self.style.SUCCESS('No oversell and no drift.'))
+
+    def _worker(self, index, customer, products, options, barrier, results, rng):
+        factory = RequestFactory()
+
+        def call(method, path, body=None):
+            match = resolve(path)
+            request = getattr(factory, method)(path, json.dumps(body or {}), content_type='application/json')
+            return match.func(request, *match.args, **match.kwargs)
+
+        timings, statuses, taken = [], Counter(), Counter()
+        try:
+            barrier.wait()
+            for _ in range(options['orders']):
+                lines = {
+                    product.pk: rng.randint(1, 3)
+                    for product in rng.sample(products, rng.randint(1, min(3, len(products))) if options['cart'] else 1)
+                }
+                if options['cart']:
+                    # Not timed: refill the cart through the cart endpoints, which reserve
+                    # the stock (an item may already be fully held by other carts)
+                    call('delete', f'/api/cart/{customer.pk}/clear/')
+                    for product_id, quantity in list(lines.items()):
+                        if call('post', f'/api/cart/{customer.pk}/add/', {'product_id': product_id, 'quantity': quantity}).status_code != 200:
+                            statuses['add rejected'] += 1
+                            del lines[product_id]
+                    if not lines:
+                        continue
+                    path, body = f'/api/orders/{customer.pk}/place/', {}
+                else:
+                    [(product_id, quantity)] = lines.items()
+                    path, body = f'/api/orders/{customer.pk}/place_direct/', {'product_id': product_id, 'quantity': quantity}
+
+                started = time.perf_counter()
+                response = call('post', path, body)
+                timings.append(time.perf_counter() - started)
+                if response.status_code == 400 and str(response.data.get('error', '')).startswith('Not enough stock'):
+                    statuses['rejected'] += 1
+                else:
+                    statuses[response.status_code] += 1
+                if response.status_code == 201:
+                    taken.update(lines)
+        finally:
+            results[index] = (timings, statuses, taken)
+            connection.close()
+
+    def _clear(self):
+        # Orders, carts and products go with their users
+        UserProfile.objects.filter(mobile_number__startswith=MOBILE_PREFIX).delete()
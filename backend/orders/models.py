@@ -1,19 +1,72 @@
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.functional import cached_property
 from users.models import UserProfile
-from products.models import Product, ProductVariant
+from products.models import Product, ProductVariant, first_image_url, prefetch_products
+
+# quantity (3 places) x unit_value (3) x price (2), kept exact
+LINE_TOTAL = models.DecimalField(max_digits=30, decimal_places=8)
+
+class CartQuerySet(models.QuerySet):
+    def touch(self):
+        """Bump ``version`` after a change to the carts' items."""
+        return self.update(version=F('version') + 1, updated_at=timezone.now())
+
+    def summary(self, pk):
+        """``version``, ``total_price`` and ``item_count`` of one cart, in one query."""
+        items = CartItem.objects.filter(cart=OuterRef('pk')).order_by()
+        total = items.with_line_totals().values('cart').annotate(total=Sum('line_total')).values('total')
+        count = items.values('cart').annotate(count=Count('id')).values('count')
+        return self.filter(pk=pk).annotate(
+            total_price=Coalesce(Subquery(total), Decimal('0'), output_field=LINE_TOTAL),
+            item_count=Coalesce(Subquery(count), 0),
+        ).values('version', 'total_price', 'item_count').get()
+
 
 class Cart(models.Model):
     user = models.OneToOneField(UserProfile, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    # Incremented by every change to the cart's items, see CartQuerySet.touch()
+    version = models.PositiveIntegerField(default=0)
+
+    objects = CartQuerySet.as_manager()
 
     def __str__(self):
         return f"Cart for {self.user.full_name}"
 
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        items = getattr(self, '_prefetched_objects_cache', {}).get('items')
+        if items is not None:
+            # Line totals already computed by the prefetch (see _serialize_cart)
+            return sum((item.total_price for item in items), Decimal('0'))
+        return self.items.total()
+
+
+def variant_subquery(field):
+    """``field`` of the variant a cart line is sold in, for annotations (see CartItem.variant)."""
+    variants = ProductVariant.objects.filter(product=OuterRef('product'), quantity=OuterRef('unit_value'))
+    return Subquery(variants.order_by('id').values(field)[:1])
+
+
+class CartItemQuerySet(models.QuerySet):
+    def with_line_totals(self):
+        """Annotate ``line_total``: quantity x variant price, or quantity x unit_value x price per unit."""
+        return self.annotate(line_total=Coalesce(
+            F('quantity') * variant_subquery('price'),
+            F('quantity') * F('unit_value') * F('product__price'),
+            output_field=LINE_TOTAL,
+        ))
+
+    def total(self):
+        return self.with_line_totals().aggregate(total=Sum('line_total'))['total'] or Decimal('0')
+
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
@@ -22,16 +75,33 @@ class CartItem(models.Model):
     unit_value = models.DecimalField(max_digits=10, decimal_places=3, default=1.000)
     added_at = models.DateTimeField(default=timezone.now)
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         unique_together = ('cart', 'product', 'unit_value')
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
+    @cached_property
+    def variant(self):
+        """The product variant sold in units of ``unit_value``, or None (priced per base unit).
+
+        Read from ``product.variants``: with the variants prefetched
+        (``prefetch_products``) a whole cart resolves without further queries.
+        """
+        unit_value = Decimal(str(self.unit_value))
+        matches = [variant for variant in self.product.variants.all() if variant.quantity == unit_value]
+        return min(matches, key=lambda variant: variant.id, default=None)
+
     @property
     def total_price(self):
+        if hasattr(self, 'line_total'):
+            # Annotated by CartItem.objects.with_line_totals()
+            return self.line_total
+
         # Specific Variant Price
-        variant = ProductVariant.objects.filter(product=self.product, quantity=self.unit_value).first()
+        variant = self.variant
         if variant:
             # For tiered, quantity is Count. Price is per item.
             return self.quantity * variant.price
@@ -40,6 +110,40 @@ class CartItem(models.Model):
         # Assuming standard behavior: quantity * unit_value * price_per_base_unit
         return self.quantity * self.unit_value * self.product.price
 
+
+class StockReservation(models.Model):
+    """Stock held for a cart until ``expires_at`` (see orders/reservations.py).
+
+    One row per stock row the cart draws on: a variant (a count) for variant
+    lines, the product (a volume) for the others. The amounts are also kept
+    in ``reserved_quantity`` on the product or variant.
+    """
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, null=True, blank=True)
+    quantity = models.DecimalField(max_digits=10, decimal_places=3)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        # The sweeper reads expired holds oldest first
+        indexes = [models.Index(fields=['expires_at'], name='reservation_expires_idx')]
+
+    def __str__(self):
+        return f"{self.quantity} of {self.product_id} for cart {self.cart_id}"
+
+class OrderQuerySet(models.QuerySet):
+    def for_serializer(self):
+        """Load the items and products OrderSerializer renders up front."""
+        return self.prefetch_related(
+            models.Prefetch('items', queryset=OrderItem.objects.order_by('id')),
+            prefetch_products('items__product'),
+        )
+
+    def for_history(self):
+        """Load what OrderHistorySerializer renders: the item snapshots and a thumbnail each, no products."""
+        items = OrderItem.objects.order_by('id').annotate(thumbnail=first_image_url('product_id'))
+        return self.prefetch_related(models.Prefetch('items', queryset=items))
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('Placed', 'Order Placed'),
@@ -71,9 +175,13 @@ class Order(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         db_table = 'orders'
         ordering = ['-created_at']
+        # A user's order history, newest first (get_order_history)
+        indexes = [models.Index(fields=['user', 'created_at'], name='order_user_created_idx')]
 
     def __str__(self):
         return f"Order #{self.id} by {self.user.full_name}"
@@ -116,3 +224,23 @@ class Transaction(models.Model):
     def __str__(self):
         return f"Transaction {self.transaction_id or 'COD'} for Order #{self.order.id}"
 
+
+class IdempotencyKey(models.Model):
+    """The order created by a request sent with an ``Idempotency-Key``, and its response (see orders/idempotency.py)."""
+    user_id = models.BigIntegerField()
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    order = models.ForeignKey('Order', on_delete=models.CASCADE, related_name='+')
+    # Stored after the order's transaction commits
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user_id', 'key'], name='idempotency_user_key_uniq')]
+        # purge_idempotency_keys deletes expired keys
+        indexes = [models.Index(fields=['expires_at'], name='idempotency_expires_idx')]
+
+    def __str__(self):
+        return f"{self.key} for user {self.user_id}"
@@ -0,0 +1,161 @@
+"""
+Stock reservations: carts hold the stock they contain.
+
+A cart change reads the cart's demand (``cart_demand``: a variant line
+needs its count of the variant, the other lines their volume of the
+product) before changing the lines, and ``reserve_cart`` then updates the
+cart's StockReservation rows: what a line grew by in this change is added
+to its hold, and holds larger than their lines shrink. The held amounts are
+kept in ``reserved_quantity`` on the product or variant, so available stock
+is ``stock_quantity - reserved_quantity``, read from the locked row instead
+of recomputed from carts. The growth fails with OutOfStock unless it is
+available (orders/stock.py); decreases and removals never fail. A popular
+item therefore runs out when it is added to a cart, not at checkout.
+
+Holds expire ``CART_RESERVATION_TTL_SECONDS`` after the cart last changed.
+``release_expired`` (``python manage.py release_expired_reservations``,
+run every minute or so) returns them in batches, oldest first, through the
+index on ``expires_at``. Checkout counts the cart's own holds as available
+to it and releases them (orders/checkout.py). A cart whose holds were
+swept holds only what its lines grow by afterwards and competes for the
+rest at checkout.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from products.models import Product, ProductVariant
+from .models import Cart, CartItem, StockReservation, variant_subquery
+from .stock import update_stock
+
+# reserved_quantity's precision: holds are stored and counted exactly
+STEP = Decimal('0.001')
+
+
+class OutOfStock(Exception):
+    pass
+
+
+def negated(amounts):
+    return {pk: -amount for pk, amount in amounts.items()}
+
+
+def _by_table(amounts):
+    """Split ``{(product_id, variant_id): amount}`` into product and variant amounts."""
+    products, variants = defaultdict(Decimal), defaultdict(Decimal)
+    for (product_id, variant_id), amount in amounts.items():
+        if variant_id is None:
+            products[product_id] += amount
+        else:
+            variants[variant_id] += amount
+    return products, variants
+
+
+def release_holds(cart):
+    """Delete the cart's reservations; returns what they held, as product and variant amounts.
+
+    The caller gives the amounts back to ``reserved_quantity`` in the same transaction.
+    """
+    holds = list(StockReservation.objects.select_for_update().filter(cart=cart).values_list(
+        'id', 'product_id', 'variant_id', 'quantity',
+    ))
+    if holds:
+        StockReservation.objects.filter(id__in=[hold[0] for hold in holds]).delete()
+    return _by_table({(product_id, variant_id): quantity for _, product_id, variant_id, quantity in holds})
+
+
+def cart_demand(cart):
+    """Lock the cart and return what its lines need, ``{(product_id, variant_id): amount}``.
+
+    Read before changing the lines and passed to ``reserve_cart`` afterwards.
+    """
+    # One change per cart at a time
+    list(Cart.objects.select_for_update(no_key=True).filter(pk=cart.pk).values_list('pk'))
+    return _demand(cart)
+
+
+def _demand(cart):
+    demand = defaultdict(Decimal)
+    lines = CartItem.objects.filter(cart=cart).annotate(variant_pk=variant_subquery('id')).values_list(
+        'product_id', 'variant_pk', 'quantity', 'unit_value',
+    )
+    for product_id, variant_id, quantity, unit_value in lines:
+        demand[(product_id, variant_id)] += quantity if variant_id is not None else quantity * unit_value
+    return {key: amount.quantize(STEP) for key, amount in demand.items()}
+
+
+def reserve_cart(cart, before):
+    """Update the cart's holds after its lines changed from ``before`` and extend their expiry.
+
+    Raises OutOfStock if what the lines grew by is not available. Run in the
+    transaction that changed the lines (after ``cart_demand`` locked the
+    cart), so a failure undoes the change.
+    """
+    demand = _demand(cart)
+    holds = {
+        (hold.product_id, hold.variant_id): hold
+        for hold in StockReservation.objects.select_for_update().filter(cart=cart)
+    }
+    held = {key: hold.quantity for key, hold in holds.items()}
+    wanted = {}
+    for key, amount in demand.items():
+        growth = amount - before.get(key, Decimal('0'))
+        # Lines that did not grow never need stock, even if their holds were swept
+        wanted[key] = held.get(key, Decimal('0')) + growth if growth > 0 else min(held.get(key, Decimal('0')), amount)
+    wanted = {key: amount for key, amount in wanted.items() if amount > 0}
+
+    changes = {
+        key: wanted.get(key, Decimal('0')) - held.get(key, Decimal('0'))
+        for key in wanted.keys() | holds.keys()
+    }
+    product_changes, variant_changes = _by_table({key: change for key, change in changes.items() if change})
+    product_growth, variant_growth = _by_table({key: change for key, change in changes.items() if change > 0})
+
+    short = update_stock(ProductVariant, reserved=variant_changes, need=variant_growth)
+    if short:
+        variant_id, available = next(iter(short.items()))
+        own = sum((amount for (_, held_variant), amount in held.items() if held_variant == variant_id), Decimal('0'))
+        raise OutOfStock(f'Not enough stock available for this variant. Available: {available + own}')
+    if update_stock(Product, reserved=product_changes, need=product_growth):
+        raise OutOfStock('Not enough stock available')
+
+    expires_at = timezone.now() + timedelta(seconds=settings.CART_RESERVATION_TTL_SECONDS)
+    gone = [hold.pk for key, hold in holds.items() if key not in wanted]
+    if gone:
+        StockReservation.objects.filter(pk__in=gone).delete()
+    kept = [hold for key, hold in holds.items() if key in wanted]
+    for hold in kept:
+        hold.quantity, hold.expires_at = wanted[(hold.product_id, hold.variant_id)], expires_at
+    StockReservation.objects.bulk_update(kept, ['quantity', 'expires_at'])
+    StockReservation.objects.bulk_create([
+        StockReservation(cart=cart, product_id=product_id, variant_id=variant_id, quantity=amount, expires_at=expires_at)
+        for (product_id, variant_id), amount in wanted.items() if (product_id, variant_id) not in holds
+    ])
+
+
+def release_expired(now=None, batch_size=1000):
+    """Release reservations that expired by ``now``, a batch per transaction; returns how many."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            # SKIP LOCKED: holds a cart is changing or checking out are left for the next run
+            batch = list(
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now).order_by('expires_at')
+                .values_list('id', 'product_id', 'variant_id', 'quantity')[:batch_size]
+            )
+            amounts = defaultdict(Decimal)
+            for _, product_id, variant_id, quantity in batch:
+                amounts[(product_id, variant_id)] -= quantity
+            products, variants = _by_table(amounts)
+            update_stock(ProductVariant, reserved=variants)
+            update_stock(Product, reserved=products)
+            StockReservation.objects.filter(id__in=[hold[0] for hold in batch]).delete()
+        released += len(batch)
+        if len(batch) < batch_size:
+            return released
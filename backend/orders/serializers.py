@@ -1,7 +1,9 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from .models import Cart, CartItem, Order, OrderItem
 from products.serializers import ProductSerializer
-from products.models import Product, ProductVariant
+from products.models import Product
 from drf_spectacular.utils import extend_schema_field
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -17,15 +19,20 @@ class CartItemSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.FloatField())
     def get_stock_quantity(self, obj):
-        # Check if there is a variant for this unit_value
-        variant = ProductVariant.objects.filter(product=obj.product, quantity=obj.unit_value).first()
-        if variant:
-            return float(variant.stock_quantity)
-        return float(obj.product.stock_quantity)
+        # What this cart can have: the variant's (or product's) stock not held
+        # by other carts. The cart's own hold is prefetched with the cart.
+        variant = obj.variant
+        variant_id = variant.id if variant else None
+        held = sum(
+            (hold.quantity for hold in obj.cart.reservations.all()
+             if hold.product_id == obj.product_id and hold.variant_id == variant_id),
+            Decimal('0'),
+        )
+        return float((variant or obj.product).available_quantity + held)
 
     @extend_schema_field(serializers.CharField(allow_null=True))
     def get_variant_label(self, obj):
-        variant = ProductVariant.objects.filter(product=obj.product, quantity=obj.unit_value).first()
+        variant = obj.variant
         if variant:
              qty = variant.quantity
              # Format to remove trailing zeros if integer
@@ -39,7 +46,23 @@ class CartSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Cart
-        fields = ['id', 'user', 'items', 'total_price', 'updated_at']
+        fields = ['id', 'user', 'items', 'total_price', 'updated_at', 'version']
+
+class CartLineSerializer(CartItemSerializer):
+    """A cart item without the nested product, for delta responses."""
+    product = None
+    product_id = serializers.IntegerField(read_only=True)
+
+    class Meta(CartItemSerializer.Meta):
+        fields = ['id', 'product_id', 'quantity', 'unit_value', 'total_price', 'stock_quantity', 'variant_label']
+
+class CartDeltaSerializer(serializers.Serializer):
+    """Response of a cart mutation with ``?view=delta``: the changed line and the cart's new totals."""
+    version = serializers.IntegerField()
+    total_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    item_count = serializers.IntegerField()
+    item = CartLineSerializer(allow_null=True)
+    removed = serializers.ListField(child=serializers.IntegerField())
 
 class OrderItemSerializer(serializers.ModelSerializer):
     # We might want full product details or just the snapshot
@@ -60,3 +83,42 @@ class OrderSerializer(serializers.ModelSerializer):
             'shipping_address', 'city', 'state', 'pincode'
         ]
         read_only_fields = ['user', 'total_amount', 'created_at', 'status', 'is_paid']
+
+class OrderHistoryItemSerializer(serializers.ModelSerializer):
+    """An order item as stored at purchase, with the product's thumbnail instead of the live product."""
+    product_id = serializers.IntegerField(read_only=True, allow_null=True)
+    # Annotated by Order.objects.for_history()
+    thumbnail = serializers.CharField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'product_id', 'product_name', 'quantity', 'price_at_purchase', 'thumbnail']
+
+class OrderHistorySerializer(OrderSerializer):
+    """A compact order for history lists; the detail endpoint has the full products."""
+    items = OrderHistoryItemSerializer(many=True, read_only=True)
+
+class CartOperationSerializer(serializers.Serializer):
+    """One step of a cart batch: add a product, set an item's quantity or remove an item."""
+    op = serializers.ChoiceField(choices=['add', 'update', 'remove'])
+    product_id = serializers.IntegerField(required=False)
+    item_id = serializers.IntegerField(required=False)
+    quantity = serializers.DecimalField(max_digits=10, decimal_places=3, required=False)
+    unit_value = serializers.DecimalField(max_digits=10, decimal_places=3, default=1)
+
+    def validate(self, data):
+        if data['op'] == 'add':
+            if 'product_id' not in data:
+                raise serializers.ValidationError({'product_id': 'This field is required.'})
+            if data.get('quantity', 1) <= 0:
+                raise serializers.ValidationError({'quantity': 'Quantity must be greater than 0'})
+            data.setdefault('quantity', 1)
+        else:
+            if 'item_id' not in data:
+                raise serializers.ValidationError({'item_id': 'This field is required.'})
+            if data['op'] == 'update' and 'quantity' not in data:
+                raise serializers.ValidationError({'quantity': 'This field is required.'})
+        return data
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
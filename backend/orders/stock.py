@@ -0,0 +1,70 @@
+"""
+Set-based stock changes on products and variants.
+
+Every change to ``stock_quantity`` or ``reserved_quantity`` (checkout,
+cancellation, cart reservations, the reservation sweeper) goes through
+``update_stock``: one locking read and one UPDATE per table, with per-row
+amounts. The rows are locked in primary key order (variants before
+products everywhere), so requests touching the same rows cannot deadlock,
+and availability (``stock_quantity - reserved_quantity``) is checked on the
+locked values. The UPDATE repeats the check in its WHERE clause::
+
+    UPDATE ... SET stock_quantity = stock_quantity - <amount for the row>
+    WHERE id IN (...) AND stock_quantity >= reserved_quantity + <amount for the row>
+
+and its row count is verified, so the check and the change can never be
+split by a concurrent writer.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, F, Q, Value, When
+
+from products.models import Product
+
+STOCK = Product._meta.get_field('stock_quantity')
+
+
+class StockChanged(Exception):
+    """The conditional UPDATE changed fewer rows than were checked."""
+
+
+def _per_row(values):
+    return Case(
+        *[When(pk=pk, then=Value(value)) for pk, value in values.items()],
+        default=Value(Decimal('0')), output_field=STOCK,
+    )
+
+
+def update_stock(model, taken=None, reserved=None, need=None):
+    """Apply per-row stock changes to ``model`` (Product or ProductVariant).
+
+    ``taken[pk]`` is subtracted from ``stock_quantity`` and ``reserved[pk]``
+    added to ``reserved_quantity`` (negative amounts give stock back or
+    release it). Rows in ``need`` must have at least ``need[pk]`` available.
+    If some do not, nothing is changed and ``{pk: available}`` is returned
+    for them; otherwise the changes are applied and ``{}`` is returned.
+    """
+    taken, reserved, need = taken or {}, reserved or {}, need or {}
+    pks = set(taken) | set(reserved)
+    if not pks:
+        return {}
+
+    # NO KEY: the lock UPDATE takes anyway, so inserts referencing the rows
+    # (cart lines, order items) are not blocked.
+    locked = model.objects.select_for_update(no_key=True).filter(pk__in=pks).order_by('pk')
+    available = {pk: stock - held for pk, stock, held in locked.values_list('pk', 'stock_quantity', 'reserved_quantity')}
+    short = {pk: available.get(pk, Decimal('0')) for pk, amount in need.items() if available.get(pk, Decimal('0')) < amount}
+    if short:
+        return short
+
+    rows = model.objects.filter(pk__in=pks)
+    if need:
+        rows = rows.filter(Q(pk__in=pks - set(need)) | Q(stock_quantity__gte=F('reserved_quantity') + _per_row(need)))
+    changes = {}
+    if taken:
+        changes['stock_quantity'] = F('stock_quantity') - _per_row(taken)
+    if reserved:
+        changes['reserved_quantity'] = F('reserved_quantity') + _per_row(reserved)
+    if rows.update(**changes) != len(available):
+        raise StockChanged(model.__name__)
+    return {}
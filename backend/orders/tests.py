@@ -0,0 +1,388 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from products.models import Product
+from users.models import UserProfile
+from .models import Cart, CartItem, IdempotencyKey, Order, OrderItem, StockReservation
+from .reservations import release_expired
+
+
+class OrderQueryCountTests(TestCase):
+    """Order endpoints run a fixed number of queries however many items they return."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = UserProfile.objects.create(
+            full_name='Vendor', mobile_number='9000000001', password_hash='x', category='Vendor'
+        )
+        cls.customer = UserProfile.objects.create(
+            full_name='Customer', mobile_number='9000000002', password_hash='x', category='Customer'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def place_order(self, item_count):
+        order = Order.objects.create(user=self.customer, total_amount=100)
+        for i in range(item_count):
+            product = Product.objects.create(
+                vendor=self.vendor, name=f'Product {i}', description='', category='Others',
+                price=10, unit='kg', stock_quantity=5,
+            )
+            product.images.create(image_url=f'https://img.example.com/{i}.jpg')
+            product.variants.create(quantity=1, unit='kg', price=10)
+            OrderItem.objects.create(
+                order=order, product=product, product_name=product.name, quantity=1, price_at_purchase=10,
+            )
+        return order
+
+    def test_order_list(self):
+        for item_count in (1, 8):
+            self.place_order(item_count)
+            # user, orders, items, products + vendor, images, variants
+            with self.assertNumQueries(6):
+                response = self.client.get(f'/api/orders/{self.customer.id}/list/')
+            self.assertEqual(response.status_code, 200)
+
+    def test_order_detail(self):
+        for item_count in (1, 8):
+            order = self.place_order(item_count)
+            with self.assertNumQueries(5):
+                response = self.client.get(f'/api/orders/detail/{order.id}/')
+            self.assertEqual(len(response.data['items']), item_count)
+
+    def test_order_list_matches_serializer(self):
+        self.place_order(3)
+        deleted = self.place_order(1).items.get().product
+        deleted.delete()  # the item keeps its snapshot, product becomes null
+        path = f'/api/orders/{self.customer.id}/list/'
+        fast = self.client.get(path).content
+        with self.settings(FAST_SERIALIZATION_ENABLED=False):
+            self.assertEqual(fast, self.client.get(path).content)
+
+    def test_order_history(self):
+        for item_count in (1, 8):
+            self.place_order(item_count)
+            # user, orders, items with thumbnails
+            with self.assertNumQueries(3):
+                response = self.client.get(f'/api/orders/{self.customer.id}/history/')
+            self.assertEqual(len(response.data['results'][0]['items']), item_count)
+
+        deleted = self.place_order(1).items.get()
+        deleted.product.delete()
+        pages, response = [], self.client.get(f'/api/orders/{self.customer.id}/history/', {'limit': 2})
+        while True:
+            pages.append(response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual([len(page) for page in pages], [2, 1])
+        newest, oldest = pages[0][0], pages[-1][-1]
+        self.assertEqual(newest['items'], [{
+            'id': deleted.id, 'product_id': None, 'product_name': 'Product 0', 'quantity': '1.000',
+            'price_at_purchase': '10.00', 'thumbnail': None,
+        }])
+        self.assertEqual(oldest['items'][0]['thumbnail'], 'https://img.example.com/0.jpg')
+        self.assertEqual(self.client.get('/api/orders/999999/history/').status_code, 404)
+
+    def test_cart(self):
+        cart = Cart.objects.create(user=self.customer)
+        for i in range(8):
+            product = Product.objects.create(
+                vendor=self.vendor, name=f'Product {i}', description='', category='Others',
+                price=10, unit='kg', stock_quantity=5,
+            )
+            product.variants.create(quantity='0.500', unit='kg', price=6, stock_quantity=4)
+            # Even items use the variant, odd ones the per-kg price
+            CartItem.objects.create(cart=cart, product=product, quantity=2, unit_value='0.5' if i % 2 == 0 else '1.5')
+            # user, cart, items, products + vendor, images, variants, reservations
+            with self.assertNumQueries(7):
+                response = self.client.get(f'/api/cart/{self.customer.id}/')
+            self.assertEqual(len(response.data['items']), i + 1)
+
+        items = response.data['items']
+        self.assertEqual((items[0]['variant_label'], items[0]['stock_quantity'], items[0]['total_price']), ('0.5 kg', 4.0, '12.00'))
+        self.assertEqual((items[1]['variant_label'], items[1]['stock_quantity'], items[1]['total_price']), (None, 5.0, '30.00'))
+        self.assertEqual(response.data['total_price'], '168.00')
+
+    def test_place_order(self):
+        for item_count in (1, 8):
+            cart, _ = Cart.objects.get_or_create(user=self.customer)
+            for i in range(item_count):
+                product = Product.objects.create(
+                    vendor=self.vendor, name=f'Product {i}', description='', category='Others',
+                    price=10, unit='kg', stock_quantity=5,
+                )
+                product.variants.create(quantity='0.500', unit='kg', price=6, stock_quantity=4)
+                CartItem.objects.create(cart=cart, product=product, quantity=2, unit_value='0.5' if i % 2 == 0 else '1.5')
+            # savepoints (2), user, cart, lines, order, transaction, delete lines, version bump,
+            # items, reservations, variant and product locks and stock (4), order rendering (4)
+            with self.assertNumQueries(19):
+                response = self.client.post(f'/api/orders/{self.customer.id}/place/', {'shipping_address': 'Street 1'}, format='json')
+            self.assertEqual(len(response.data['items']), item_count)
+
+
+class CartStockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor = UserProfile.objects.create(
+            full_name='Vendor', mobile_number='9000000001', password_hash='x', category='Vendor'
+        )
+        cls.customer = UserProfile.objects.create(
+            full_name='Customer', mobile_number='9000000002', password_hash='x', category='Customer'
+        )
+        cls.product = Product.objects.create(
+            vendor=vendor, name='Rice', description='', category='Rice', price='52.50', unit='kg', stock_quantity=3,
+        )
+        cls.product.variants.create(quantity=5, unit='kg', price='240.00', stock_quantity=2)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def add(self, quantity, unit_value):
+        return self.client.post(
+            f'/api/cart/{self.customer.id}/add/', {'product_id': self.product.id, 'quantity': quantity, 'unit_value': unit_value},
+            format='json',
+        )
+
+    def test_volume_counts_every_line(self):
+        self.assertEqual(self.add(2, 0.5).status_code, 200)   # 1 kg
+        self.assertEqual(self.add(1, 1.5).status_code, 200)   # 2.5 kg
+        self.assertEqual(self.add(1, 1).status_code, 400)     # 3.5 kg > 3 kg
+        response = self.add(2, 0.25)                          # 3 kg
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_price'], '157.50')
+
+        item = CartItem.objects.get(unit_value='0.5')
+        update = f'/api/cart/{self.customer.id}/update/{item.id}/'
+        self.assertEqual(self.client.put(update, {'quantity': 3}, format='json').status_code, 400)
+        self.assertEqual(self.client.put(update, {'quantity': 'x'}, format='json').status_code, 400)
+
+    def test_line_stock_counts_own_hold(self):
+        self.assertEqual(self.add(2, 0.5).data['items'][0]['stock_quantity'], 3.0)
+        other = UserProfile.objects.create(
+            full_name='Other', mobile_number='9000000003', password_hash='x', category='Customer'
+        )
+        response = self.client.post(
+            f'/api/cart/{other.id}/add/', {'product_id': self.product.id, 'quantity': 1, 'unit_value': 1},
+            format='json',
+        )
+        # 1 kg held by the first cart
+        self.assertEqual(response.data['items'][0]['stock_quantity'], 2.0)
+        self.assertEqual(response.data['items'][0]['product']['available_quantity'], '1.000')
+
+    def test_variant_line(self):
+        self.assertEqual(self.add(2, 5).status_code, 200)
+        self.assertEqual(self.add(1, 5).status_code, 400)
+        cart = Cart.objects.get(user=self.customer)
+        self.assertEqual(cart.total_price, Decimal('480'))
+
+    def test_batch(self):
+        first = self.add(2, 0.5).data['items'][0]['id']                    # 1 kg
+        second = self.add(1, 5).data['items'][1]['id']                     # 1 x 5 kg variant
+        batch = f'/api/cart/{self.customer.id}/batch/'
+        # user, cart, demand before, lines, products, variants, delete, update, insert,
+        # reservations (9), version bump and read, cart rendering (5), savepoint (2)
+        with self.assertNumQueries(27):
+            response = self.client.post(batch, {'operations': [
+                {'op': 'remove', 'item_id': second},
+                {'op': 'update', 'item_id': first, 'quantity': 4},                       # 2 kg
+                {'op': 'add', 'product_id': self.product.id, 'quantity': 1, 'unit_value': 1},   # 3 kg
+            ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        lines = [(item['unit_value'], item['quantity']) for item in response.data['items']]
+        self.assertEqual(lines, [('0.500', '4.000'), ('1.000', '1.000')])
+
+        # Over stock: nothing is applied
+        response = self.client.post(batch, {'operations': [
+            {'op': 'remove', 'item_id': first},
+            {'op': 'add', 'product_id': self.product.id, 'quantity': 3, 'unit_value': 1},  # 4 kg
+        ]}, format='json')
+        self.assertEqual((response.status_code, response.data['operation']), (400, 1))
+        self.assertEqual(CartItem.objects.count(), 2)
+        self.assertEqual(self.client.post(batch, {'operations': [{'op': 'update', 'item_id': first}]}, format='json').status_code, 400)
+
+    def test_place_order(self):
+        self.add(2, 1)   # 2 kg
+        self.add(1, 5)   # 1 x 5 kg variant
+        place = f'/api/orders/{self.customer.id}/place/'
+        self.product.variants.update(stock_quantity=0)
+        response = self.client.post(place, {'shipping_address': 'Street 1'}, format='json')
+        self.assertEqual(response.data, {'error': 'Not enough stock for Rice (5.000 kg)'})
+
+        # Nothing was taken or written
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 3)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.count(), 2)
+
+        self.product.variants.update(stock_quantity=2)
+        response = self.client.post(place, {'shipping_address': 'Street 1'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_amount'], '345.00')
+        items = [(item['product_name'], item['quantity'], item['price_at_purchase']) for item in response.data['items']]
+        self.assertEqual(items, [('Rice', '2.000', '52.50'), ('Rice (5.000 kg)', '1.000', '240.00')])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+        self.assertEqual(self.product.variants.get().stock_quantity, 1)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_direct_order_and_cancel(self):
+        direct = f'/api/orders/{self.customer.id}/place_direct/'
+        order = {'shipping_address': 'Street 1', 'product_id': self.product.id}
+        variant_order = self.client.post(direct, {**order, 'quantity': 1, 'unit_value': 5}, format='json').data
+        self.assertEqual(variant_order['total_amount'], '240.00')
+        self.assertEqual(self.client.post(direct, {**order, 'quantity': 2}, format='json').status_code, 201)
+        response = self.client.post(direct, {**order, 'quantity': 1}, format='json')
+        self.assertEqual(response.data, {'error': 'Not enough stock for Rice'})
+        self.assertEqual(Order.objects.count(), 2)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock_quantity, self.product.variants.get().stock_quantity), (0, 1))
+
+        cancel = f"/api/orders/{self.customer.id}/cancel/{variant_order['id']}/"
+        self.assertEqual(self.client.post(cancel, format='json').status_code, 200)
+        self.assertEqual(self.client.post(cancel, format='json').status_code, 400)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock_quantity, self.product.variants.get().stock_quantity), (1, 2))
+
+    def test_direct_order_needs_positive_amounts(self):
+        direct = f'/api/orders/{self.customer.id}/place_direct/'
+        order = {'shipping_address': 'Street 1', 'product_id': self.product.id}
+        for amounts in ({'quantity': -2}, {'quantity': 0}, {'quantity': 1, 'unit_value': -1}, {'quantity': 'NaN'}):
+            with self.subTest(**amounts):
+                response = self.client.post(direct, {**order, **amounts}, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 3)
+
+    def test_reservations(self):
+        other = UserProfile.objects.create(
+            full_name='Other', mobile_number='9000000003', password_hash='x', category='Customer'
+        )
+        other_add = f'/api/cart/{other.id}/add/'
+        self.assertEqual(self.add(2, 1).status_code, 200)        # holds 2 of 3 kg
+        self.assertEqual(self.add(1, 5).status_code, 200)        # holds 1 of 2 variants
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_quantity, 2)
+
+        response = self.client.post(other_add, {'product_id': self.product.id, 'quantity': 2}, format='json')
+        self.assertEqual(response.data, {'error': 'Not enough stock available'})
+        response = self.client.post(other_add, {'product_id': self.product.id, 'quantity': 2, 'unit_value': 5}, format='json')
+        self.assertEqual(response.data, {'error': 'Not enough stock available for this variant. Available: 1.000'})
+        self.assertEqual(CartItem.objects.filter(cart__user=other).count(), 0)
+
+        # A vendor edit does not write back a stale reservation count
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(self.client.post(other_add, {'product_id': self.product.id, 'quantity': 1}, format='json').status_code, 200)
+        product.save()
+        product.refresh_from_db()
+        self.assertEqual(product.reserved_quantity, 3)
+
+        # Expired holds are released; the other cart can then take the stock
+        self.assertEqual(release_expired(now=timezone.now() + timedelta(days=1)), 3)
+        self.assertFalse(StockReservation.objects.exists())
+        product.refresh_from_db()
+        self.assertEqual((product.reserved_quantity, product.variants.get().reserved_quantity), (0, 0))
+        response = self.client.post(other_add, {'product_id': self.product.id, 'quantity': 2, 'unit_value': 5}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        # Checkout converts the cart's holds into stock taken
+        response = self.client.post(f'/api/orders/{other.id}/place/', {'shipping_address': 'Street 1'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        product.refresh_from_db()
+        variant = product.variants.get()
+        self.assertEqual((product.stock_quantity, product.reserved_quantity), (0, 0))
+        self.assertEqual((variant.stock_quantity, variant.reserved_quantity), (0, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_swept_cart_can_shrink(self):
+        self.assertEqual(self.add(2, 1).status_code, 200)
+        variant_item = self.add(1, 5).data['items'][1]['id']
+        product_item = CartItem.objects.get(unit_value=1).id
+        release_expired(now=timezone.now() + timedelta(days=1))
+        other = UserProfile.objects.create(
+            full_name='Other', mobile_number='9000000003', password_hash='x', category='Customer'
+        )
+        response = self.client.post(f'/api/cart/{other.id}/add/', {'product_id': self.product.id, 'quantity': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        # Decreases and removals never need stock, growth does
+        cart = f'/api/cart/{self.customer.id}'
+        self.assertEqual(self.client.delete(f'{cart}/remove/{variant_item}/').status_code, 200)
+        self.assertEqual(self.client.put(f'{cart}/update/{product_item}/', {'quantity': 1}, format='json').status_code, 200)
+        response = self.client.put(f'{cart}/update/{product_item}/', {'quantity': 2}, format='json')
+        self.assertEqual(response.data, {'error': 'Not enough stock available'})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_quantity, 3)
+        self.assertEqual(StockReservation.objects.filter(cart__user=self.customer).count(), 0)
+
+    def test_idempotency_key(self):
+        direct = f'/api/orders/{self.customer.id}/place_direct/'
+        order = {'shipping_address': 'Street 1', 'product_id': self.product.id, 'quantity': 1}
+        first = self.client.post(direct, order, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(first.status_code, 201)
+        with self.assertNumQueries(1):
+            retry = self.client.post(direct, order, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual((retry.status_code, retry.data), (201, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 2)
+
+        response = self.client.post(direct, {**order, 'quantity': 2}, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(response.status_code, 422)
+
+        # Committed but its response not stored yet: rendered from the order
+        IdempotencyKey.objects.update(status_code=None, response=None)
+        retry = self.client.post(direct, order, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual((retry.status_code, retry.data), (201, first.data))
+        self.assertEqual(IdempotencyKey.objects.get().response, first.data)
+
+        # Failures are not stored: the same key can be retried once the request succeeds
+        response = self.client.post(direct, {**order, 'quantity': 5}, format='json', HTTP_IDEMPOTENCY_KEY='order-2')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(direct, {**order, 'quantity': 5}, format='json', HTTP_IDEMPOTENCY_KEY='order-2')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_delta_responses(self):
+        full = self.add(2, 0.5)
+        self.assertEqual(full.data['version'], 1)
+        item_id = full.data['items'][0]['id']
+
+        path = f'/api/cart/{self.customer.id}/add/?view=delta'
+        response = self.client.post(path, {'product_id': self.product.id, 'quantity': 1, 'unit_value': 5}, format='json')
+        self.assertEqual(response.data['version'], 2)
+        self.assertEqual((response.data['total_price'], response.data['item_count']), ('292.50', 2))
+        self.assertEqual(response.data['item']['variant_label'], '5 kg')
+        self.assertEqual(response.data['item']['total_price'], '240.00')
+        self.assertNotIn('product', response.data['item'])
+
+        response = self.client.delete(f'/api/cart/{self.customer.id}/remove/{item_id}/?view=delta')
+        self.assertEqual(response.data, {
+            'version': 3, 'total_price': '240.00', 'item_count': 1, 'item': None, 'removed': [item_id],
+        })
+        response = self.client.delete(f'/api/cart/{self.customer.id}/clear/?view=delta')
+        self.assertEqual((response.data['version'], response.data['total_price'], response.data['item_count']), (4, '0.00', 0))
+
+    def test_version_bumped_with_the_change(self):
+        # The bump commits (here: the savepoint is released) together with the change
+        with CaptureQueriesContext(connection) as queries:
+            self.add(2, 0.5)
+        sql = [query['sql'] for query in queries.captured_queries]
+        bump = next(i for i, query in enumerate(sql) if query.startswith('UPDATE') and '"version"' in query)
+        release = max(i for i, query in enumerate(sql) if query.startswith('RELEASE SAVEPOINT'))
+        self.assertLess(bump, release)
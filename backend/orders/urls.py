@@ -8,11 +8,13 @@ urlpatterns = [
     path('cart/<int:user_id>/update/<int:item_id>/', views.update_cart_item, name='update_cart_item'),
     path('cart/<int:user_id>/remove/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('cart/<int:user_id>/clear/', views.clear_cart, name='clear_cart'),
+    path('cart/<int:user_id>/batch/', views.cart_batch, name='cart_batch'),
     
     # Order URLs
     path('orders/<int:user_id>/place/', views.place_order, name='place_order'),
     path('orders/<int:user_id>/place_direct/', views.place_direct_order, name='place_direct_order'),
     path('orders/<int:user_id>/list/', views.get_orders, name='get_orders'),
+    path('orders/<int:user_id>/history/', views.get_order_history, name='get_order_history'),
     path('orders/detail/<int:order_id>/', views.get_order_details, name='get_order_details'),
     path('orders/<int:user_id>/cancel/<int:order_id>/', views.cancel_order, name='cancel_order'),
 ]
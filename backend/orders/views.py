@@ -1,23 +1,68 @@
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.db import transaction
-from .models import Cart, CartItem, Order, OrderItem, CancelledOrder, Transaction
-from products.models import Product, ProductVariant
+from django.db.models import F, Prefetch, prefetch_related_objects
+from .models import Cart, CartItem, Order, CancelledOrder, Transaction
+from products.models import Product, ProductVariant, prefetch_products
 from users.models import UserProfile
-from .serializers import CartSerializer, OrderSerializer
+from .batch import CartBatchError, apply_cart_operations
+from .checkout import CheckoutLine, cart_lines, line_total, place_lines, restore_lines
+from .idempotency import idempotent, record_key
+from .reservations import OutOfStock, cart_demand, reserve_cart
+from .serializers import CartBatchSerializer, CartDeltaSerializer, CartSerializer, OrderHistorySerializer, OrderSerializer
+from shaaka_backend.compiled_serializers import compile_serializer
+from shaaka_backend.pagination import KeysetPagination
 from drf_spectacular.utils import extend_schema, inline_serializer
 from rest_framework import serializers
 
+def _serialize_order(order):
+    prefetch_related_objects([order], prefetch_products('items__product'))
+    return OrderSerializer(order).data
+
+
+def _serialize_cart(cart):
+    # Variants come with the products, see CartItem.variant
+    prefetch_related_objects(
+        [cart],
+        Prefetch('items', queryset=CartItem.objects.with_line_totals().order_by('id')),
+        prefetch_products('items__product'),
+        'reservations',
+    )
+    return CartSerializer(cart).data
+
+
+def _cart_changed(request, cart, item=None, removed=(), delta=True):
+    """Build the response to a cart mutation.
+
+    The mutation bumps the cart's version in its own transaction. The full
+    cart by default; with ``?view=delta`` only the changed line
+    (``item``), the ids of ``removed`` lines and the cart's new total, item
+    count and version. Clients patch their copy and refetch the cart when
+    the version is not the one they expected.
+    """
+    if not delta or request.query_params.get('view') != 'delta':
+        cart.refresh_from_db(fields=['version', 'updated_at'])
+        return Response(_serialize_cart(cart))
+
+    if item is not None:
+        item = CartItem.objects.with_line_totals().select_related('product', 'cart').prefetch_related(
+            Prefetch('product__variants', queryset=ProductVariant.objects.order_by('id')), 'cart__reservations',
+        ).get(pk=item.pk)
+    return Response(CartDeltaSerializer({**Cart.objects.summary(cart.pk), 'item': item, 'removed': list(removed)}).data)
+
+
 @extend_schema(responses={200: CartSerializer})
 @api_view(['GET'])
 def get_cart(request, user_id):
     try:
         user = UserProfile.objects.get(id=user_id)
         cart, created = Cart.objects.get_or_create(user=user)
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        return Response(_serialize_cart(cart))
     except UserProfile.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -40,7 +85,7 @@ def add_to_cart(request, user_id):
         
         product_id = request.data.get('product_id')
         quantity = int(request.data.get('quantity', 1))
-        unit_value = float(request.data.get('unit_value', 1.0))
+        unit_value = Decimal(str(request.data.get('unit_value', 1.0)))
         
         if quantity <= 0:
              return Response({'error': 'Quantity must be greater than 0'}, status=status.HTTP_400_BAD_REQUEST)
@@ -51,42 +96,23 @@ def add_to_cart(request, user_id):
         if product.vendor == user:
             return Response({'error': 'You cannot add your own product to cart'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # STOCK VALIDATION
-        variant = ProductVariant.objects.filter(product=product, quantity=unit_value).first()
-        
-        if variant:
-            # Tiered Pricing: Check Variant Stock (Count)
-            # Find existing quantity of this variant in cart
-            existing_item = CartItem.objects.filter(cart=cart, product=product, unit_value=unit_value).first()
-            existing_qty = float(existing_item.quantity) if existing_item else 0.0
-            
-            total_needed = existing_qty + quantity
-            if total_needed > float(variant.stock_quantity):
-                 return Response({'error': f'Not enough stock available for this variant. Available: {variant.stock_quantity}'}, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            # Standard Pricing: Check Global Stock (Volume/Weight)
-            required_stock = quantity * unit_value
-            # Also check existing cart items for this product (aggregated)
-            existing_items = CartItem.objects.filter(cart=cart, product=product)
-            existing_volume = sum(float(item.quantity) * float(item.unit_value) for item in existing_items)
-            
-            total_volume_needed = existing_volume + required_stock
+        # Add/Update Cart Item and hold its stock (orders/reservations.py):
+        # rolled back if the cart now wants more than is available
+        with transaction.atomic():
+            before = cart_demand(cart)
+            cart_item, item_created = CartItem.objects.get_or_create(
+                cart=cart, 
+                product=product,
+                unit_value=unit_value,
+                defaults={'quantity': 0}
+            )
             
-            if total_volume_needed > float(product.stock_quantity):
-                return Response({'error': 'Not enough stock available'}, status=status.HTTP_400_BAD_REQUEST)
+            cart_item.quantity = F('quantity') + quantity
+            cart_item.save(update_fields=['quantity'])
+            reserve_cart(cart, before)
+            Cart.objects.filter(pk=cart.pk).touch()
         
-        # Add/Update Cart Item
-        cart_item, item_created = CartItem.objects.get_or_create(
-            cart=cart, 
-            product=product,
-            unit_value=unit_value,
-            defaults={'quantity': 0}
-        )
-        
-        cart_item.quantity = float(cart_item.quantity) + quantity
-        cart_item.save()
-        
-        return Response(CartSerializer(cart).data, status=status.HTTP_200_OK)
+        return _cart_changed(request, cart, item=cart_item)
         
     except UserProfile.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -107,36 +133,30 @@ def update_cart_item(request, user_id, item_id):
         cart = Cart.objects.get(user=user)
         cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
         
-        quantity = float(request.data.get('quantity'))
+        quantity = Decimal(str(request.data.get('quantity')))
         
-        if quantity <= 0:
-            cart_item.delete()
-        else:
-            # STOCK VALIDATION
-            variant = ProductVariant.objects.filter(product=cart_item.product, quantity=cart_item.unit_value).first()
-            
-            if variant:
-                 # Tiered: Check Count
-                 if quantity > float(variant.stock_quantity):
-                     return Response({'error': f'Not enough stock available. Available: {variant.stock_quantity}'}, status=status.HTTP_400_BAD_REQUEST)
+        # The cart's holds follow the change; a quantity that is not available rolls it back
+        with transaction.atomic():
+            before = cart_demand(cart)
+            if quantity <= 0:
+                cart_item.delete()
             else:
-                 # Standard: Check Volume
-                 required_stock = quantity * float(cart_item.unit_value)
-                 # We should technically exclude current item from existing sum, but for simple update:
-                 # Just check if this new quantity fits in total stock?
-                 # ideally: total_product_stock >= (other_items_volume + this_item_volume)
-                 # simplified: just check this item vs stock (assuming singular item type in cart usually or strict check)
-                 if required_stock > float(cart_item.product.stock_quantity):
-                     return Response({'error': 'Not enough stock available'}, status=status.HTTP_400_BAD_REQUEST)
-
-            cart_item.quantity = quantity
-            cart_item.save()
-            
-        return Response(CartSerializer(cart).data)
+                cart_item.quantity = quantity
+                cart_item.save(update_fields=['quantity'])
+            reserve_cart(cart, before)
+            Cart.objects.filter(pk=cart.pk).touch()
+
+        if quantity <= 0:
+            return _cart_changed(request, cart, removed=[item_id])
+        return _cart_changed(request, cart, item=cart_item)
     except UserProfile.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
     except Cart.DoesNotExist:
         return Response({'error': 'Cart not found'}, status=status.HTTP_404_NOT_FOUND)
+    except InvalidOperation:
+        return Response({'error': 'A valid quantity is required'}, status=status.HTTP_400_BAD_REQUEST)
+    except OutOfStock as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @extend_schema(responses={200: CartSerializer})
 @api_view(['DELETE'])
@@ -145,20 +165,56 @@ def remove_from_cart(request, user_id, item_id):
         user = UserProfile.objects.get(id=user_id)
         cart = Cart.objects.get(user=user)
         cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
-        cart_item.delete()
+        with transaction.atomic():
+            before = cart_demand(cart)
+            cart_item.delete()
+            reserve_cart(cart, before)
+            Cart.objects.filter(pk=cart.pk).touch()
         
-        return Response(CartSerializer(cart).data)
+        return _cart_changed(request, cart, removed=[item_id])
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+@extend_schema(request=CartBatchSerializer, responses={200: CartSerializer})
+@api_view(['POST'])
+def cart_batch(request, user_id):
+    """Apply several add/update/remove operations at once; all or nothing."""
+    serializer = CartBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    try:
+        user = UserProfile.objects.get(id=user_id)
+    except UserProfile.DoesNotExist:
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user=user)
+        before = cart_demand(cart)
+        try:
+            apply_cart_operations(cart, user, serializer.validated_data['operations'])
+            reserve_cart(cart, before)
+        except CartBatchError as e:
+            transaction.set_rollback(True)
+            return Response({'error': str(e), 'operation': e.index}, status=status.HTTP_400_BAD_REQUEST)
+        except OutOfStock as e:
+            # Stock held by other carts: no single operation is at fault
+            transaction.set_rollback(True)
+            return Response({'error': str(e), 'operation': None}, status=status.HTTP_400_BAD_REQUEST)
+        Cart.objects.filter(pk=cart.pk).touch()
+        return _cart_changed(request, cart, delta=False)
+
 @extend_schema(responses={200: CartSerializer})
 @api_view(['DELETE'])
 def clear_cart(request, user_id):
     try:
         user = UserProfile.objects.get(id=user_id)
         cart = Cart.objects.get(user=user)
-        cart.items.all().delete()
-        return Response(CartSerializer(cart).data)
+        with transaction.atomic():
+            before = cart_demand(cart)
+            removed = list(cart.items.values_list('id', flat=True))
+            CartItem.objects.filter(id__in=removed).delete()
+            reserve_cart(cart, before)
+            Cart.objects.filter(pk=cart.pk).touch()
+        return _cart_changed(request, cart, removed=removed)
     except Exception as e:
          return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -177,14 +233,10 @@ def clear_cart(request, user_id):
     responses={201: OrderSerializer}
 )
 @api_view(['POST'])
-@transaction.atomic
+@idempotent(_serialize_order)
 def place_order(request, user_id):
     try:
         user = UserProfile.objects.get(id=user_id)
-        cart = get_object_or_404(Cart, user=user)
-        
-        if not cart.items.exists():
-            return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Prepare Order Data
         shipping_address = request.data.get('shipping_address') or user.address_line
@@ -194,82 +246,48 @@ def place_order(request, user_id):
         payment_method = request.data.get('payment_method', 'COD')
         is_paid = request.data.get('is_paid', False)
 
-        if not shipping_address:
-             return Response({'error': 'Shipping address required'}, status=status.HTTP_400_BAD_REQUEST)
+        # Running out of stock rolls all of this back. Stock is taken last so
+        # its row locks are held only until the commit, not while rendering.
+        with transaction.atomic():
+            # Locked: cart changes and a second checkout of this cart wait for
+            # the commit, so exactly the lines read here are ordered and removed
+            cart = get_object_or_404(Cart.objects.select_for_update(no_key=True), user=user)
+            lines, total_amount, item_ids = cart_lines(cart)
 
-        # Create Order
-        order = Order.objects.create(
-            user=user,
-            shipping_address=shipping_address,
-            city=city,
-            state=state,
-            pincode=pincode,
-            total_amount=cart.total_price,
-            payment_method=payment_method,
-            is_paid=is_paid
-        )
-        
-        # Move items to Order Items and Deduct Stock
-        for item in cart.items.all():
-            variant = ProductVariant.objects.filter(product=item.product, quantity=item.unit_value).first()
-            
-            if variant:
-                # Tiered: Deduct Count from Variant
-                deduction_quantity = float(item.quantity) # For variants, quantity is count
-                
-                if deduction_quantity > float(variant.stock_quantity):
-                    raise Exception(f"Not enough stock for {item.product.name} ({variant.quantity} {variant.unit})")
-                
-                variant.stock_quantity = float(variant.stock_quantity) - deduction_quantity
-                variant.save()
-                
-                # Update global stock as sum (approximate)
-                item.product.stock_quantity = float(item.product.stock_quantity) - deduction_quantity 
-                item.product.save()
-
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    product_name=f"{item.product.name} ({variant.quantity} {variant.unit})",
-                    quantity=deduction_quantity, 
-                    price_at_purchase=variant.price
-                )
+            if not lines:
+                return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
+            if not shipping_address:
+                return Response({'error': 'Shipping address required'}, status=status.HTTP_400_BAD_REQUEST)
 
-            else:
-                # Standard: Deduct Volume from Product
-                deduction_quantity = float(item.quantity) * float(item.unit_value)
-                
-                if deduction_quantity > float(item.product.stock_quantity):
-                    raise Exception(f"Not enough stock for {item.product.name}")
-                
-                item.product.stock_quantity = float(item.product.stock_quantity) - deduction_quantity
-                item.product.save()
-            
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    product_name=item.product.name,
-                    quantity=deduction_quantity, 
-                    price_at_purchase=item.product.price
-                )
-            
-            # Additional Fix for OrderItem Price:
-            # If variant, we should use variant price.
-            # But OrderItem model might assume single price.
-            # Let's check OrderItem model briefly if I can.
-            
-        # Clear Cart
-        cart.items.all().delete()
-        
-        # Record Transaction
-        Transaction.objects.create(
-            order=order,
-            payment_method=payment_method,
-            amount=order.total_amount,
-            status='Success' if is_paid else 'Pending'
-        )
-        
-        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+            order = Order.objects.create(
+                user=user,
+                shipping_address=shipping_address,
+                city=city,
+                state=state,
+                pincode=pincode,
+                total_amount=total_amount,
+                payment_method=payment_method,
+                is_paid=is_paid
+            )
+            record_key(request, order)
+
+            # Record Transaction
+            Transaction.objects.create(
+                order=order,
+                payment_method=payment_method,
+                amount=order.total_amount,
+                status='Success' if is_paid else 'Pending'
+            )
+
+            # Clear Cart
+            CartItem.objects.filter(id__in=item_ids).delete()
+            Cart.objects.filter(pk=cart.pk).touch()
+
+            # Order items and stock for all lines at once, see orders/checkout.py;
+            # the cart's reservations are converted into the deductions
+            place_lines(order, lines, cart=cart)
+
+        return Response(_serialize_order(order), status=status.HTTP_201_CREATED)
         
     except UserProfile.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -294,7 +312,7 @@ def place_order(request, user_id):
     responses={201: OrderSerializer}
 )
 @api_view(['POST'])
-@transaction.atomic
+@idempotent(_serialize_order)
 def place_direct_order(request, user_id):
     try:
         user = UserProfile.objects.get(id=user_id)
@@ -308,8 +326,12 @@ def place_direct_order(request, user_id):
         is_paid = request.data.get('is_paid', False)
         
         product_id = request.data.get('product_id')
-        quantity = float(request.data.get('quantity', 1.0))
-        unit_value = float(request.data.get('unit_value', 1.0))
+        quantity = Decimal(str(request.data.get('quantity', 1.0)))
+        unit_value = Decimal(str(request.data.get('unit_value', 1.0)))
+
+        # A negative amount would give stock back through update_stock
+        if not (quantity.is_finite() and unit_value.is_finite()) or quantity <= 0 or unit_value <= 0:
+            return Response({'error': 'Quantity and unit value must be greater than 0'}, status=status.HTTP_400_BAD_REQUEST)
 
         if not shipping_address:
              return Response({'error': 'Shipping address required'}, status=status.HTTP_400_BAD_REQUEST)
@@ -317,66 +339,38 @@ def place_direct_order(request, user_id):
         product = get_object_or_404(Product, id=product_id)
         
         # Verify user is not buying their own product
-        if product.vendor == user:
+        if product.vendor_id == user.id:
             return Response({'error': 'You cannot checkout your own product'}, status=status.HTTP_400_BAD_REQUEST)
             
-        variant = ProductVariant.objects.filter(product=product, quantity=unit_value).first()
-        
-        price_at_purchase = product.price
-        total_amount = float(product.price) * quantity * unit_value
-        product_name = product.name
-        
-        if variant:
-            deduction_quantity = quantity # Count
-            if deduction_quantity > float(variant.stock_quantity):
-                return Response({'error': f"Not enough stock for {product.name} ({variant.quantity} {variant.unit})"}, status=status.HTTP_400_BAD_REQUEST)
-            price_at_purchase = variant.price
-            total_amount = float(variant.price) * quantity
-            product_name = f"{product.name} ({variant.quantity} {variant.unit})"
-            
-            variant.stock_quantity = float(variant.stock_quantity) - deduction_quantity
-            variant.save()
-            product.stock_quantity = float(product.stock_quantity) - deduction_quantity
-            product.save()
-        else:
-            deduction_quantity = quantity * unit_value
-            if deduction_quantity > float(product.stock_quantity):
-                return Response({'error': f"Not enough stock for {product.name}"}, status=status.HTTP_400_BAD_REQUEST)
-            price_at_purchase = product.price
-            total_amount = float(product.price) * deduction_quantity
-            
-            product.stock_quantity = float(product.stock_quantity) - deduction_quantity
-            product.save()
-
-        # Create Order
-        order = Order.objects.create(
-            user=user,
-            shipping_address=shipping_address,
-            city=city,
-            state=state,
-            pincode=pincode,
-            total_amount=total_amount,
-            payment_method=payment_method,
-            is_paid=is_paid
-        )
-
-        OrderItem.objects.create(
-            order=order,
-            product=product,
-            product_name=product_name,
-            quantity=deduction_quantity if not variant else quantity, 
-            price_at_purchase=price_at_purchase
-        )
-
-        # Record Transaction
-        Transaction.objects.create(
-            order=order,
-            payment_method=payment_method,
-            amount=total_amount,
-            status='Success' if is_paid else 'Pending'
-        )
-        
-        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+        variant = product.variants.filter(quantity=unit_value).order_by('id').first()
+        line = CheckoutLine(product, variant, quantity, unit_value)
+        total_amount = line_total(line)
+
+        # Same conditional stock update as place_order, taken last; a shortage rolls back the order
+        with transaction.atomic():
+            order = Order.objects.create(
+                user=user,
+                shipping_address=shipping_address,
+                city=city,
+                state=state,
+                pincode=pincode,
+                total_amount=total_amount,
+                payment_method=payment_method,
+                is_paid=is_paid
+            )
+            record_key(request, order)
+
+            # Record Transaction
+            Transaction.objects.create(
+                order=order,
+                payment_method=payment_method,
+                amount=total_amount,
+                status='Success' if is_paid else 'Pending'
+            )
+
+            place_lines(order, [line])
+
+        return Response(_serialize_order(order), status=status.HTTP_201_CREATED)
         
     except UserProfile.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -389,16 +383,45 @@ def get_orders(request, user_id):
     try:
         # Check if user exists
         user = UserProfile.objects.get(id=user_id)
-        orders = Order.objects.filter(user=user).order_by('-created_at')
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        orders = Order.objects.for_serializer().filter(user=user).order_by('-created_at')
+
+        if settings.FAST_SERIALIZATION_ENABLED:
+            # Rendered from values() rows, see shaaka_backend/compiled_serializers.py
+            compiled = compile_serializer(OrderSerializer)
+            orders = compiled.values(orders)
+            serialize = compiled.serialize
+        else:
+            serialize = lambda rows: OrderSerializer(rows, many=True).data
+
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(orders, request)
+        if page is not None:
+            return paginator.get_paginated_response(serialize(page))
+        return Response(serialize(orders))
     except UserProfile.DoesNotExist:
          return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
+class OrderHistoryPagination(KeysetPagination):
+    opt_in = False
+
+@extend_schema(responses={200: inline_serializer(
+    name='OrderHistoryPage',
+    fields={'next': serializers.URLField(allow_null=True), 'results': OrderHistorySerializer(many=True)},
+)})
+@api_view(['GET'])
+def get_order_history(request, user_id):
+    """A page of the user's orders, newest first, with item snapshots; ``next`` links the following page."""
+    if not UserProfile.objects.filter(id=user_id).exists():
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+    orders = Order.objects.for_history().filter(user_id=user_id).order_by('-created_at')
+    paginator = OrderHistoryPagination()
+    page = paginator.paginate_queryset(orders, request)
+    return paginator.get_paginated_response(OrderHistorySerializer(page, many=True).data)
+
 @extend_schema(responses={200: OrderSerializer})
 @api_view(['GET'])
 def get_order_details(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(Order.objects.for_serializer(), id=order_id)
     serializer = OrderSerializer(order)
     return Response(serializer.data)
 
@@ -414,7 +437,8 @@ def get_order_details(request, order_id):
 def cancel_order(request, user_id, order_id):
     try:
         user = UserProfile.objects.get(id=user_id)
-        order = get_object_or_404(Order, id=order_id, user=user)
+        # Locked so two concurrent cancellations cannot both return the stock
+        order = get_object_or_404(Order.objects.select_for_update(), id=order_id, user=user)
 
         if order.status not in ['Placed', 'Processing']:
             return Response({'error': f"Order cannot be cancelled. Current status is {order.status}."}, status=status.HTTP_400_BAD_REQUEST)
@@ -425,23 +449,8 @@ def cancel_order(request, user_id, order_id):
         if hasattr(order, 'cancellation'):
            return Response({'error': 'Order is already cancelled'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Restore Stock
-        for item in order.items.all():
-            product = item.product
-            if product:
-                # Based on how place_order deducts stock:
-                # If it's a variant, item.product_name != product.name (appends " (qty unit)")
-                if item.product_name != product.name:
-                    # It's a variant. Try to find the exact variant by price_at_purchase.
-                    # As place_order assigns variant.price to price_at_purchase.
-                    variant = ProductVariant.objects.filter(product=product, price=item.price_at_purchase).first()
-                    if variant:
-                        variant.stock_quantity = float(variant.stock_quantity) + float(item.quantity)
-                        variant.save()
-                
-                # Restore global product stock (applies to both variants and standard)
-                product.stock_quantity = float(product.stock_quantity) + float(item.quantity)
-                product.save()
+        # Restore Stock (F() updates, see orders/checkout.py)
+        restore_lines(order.items.select_related('product'))
 
         # Update order status
         order.status = 'Cancelled'
@@ -450,8 +459,7 @@ def cancel_order(request, user_id, order_id):
         # Create cancellation record
         CancelledOrder.objects.create(order=order, reason=reason)
 
-        serializer = OrderSerializer(order)
-        return Response(serializer.data)
+        return Response(_serialize_order(order))
         
     except UserProfile.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
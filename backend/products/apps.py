@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "products"
+
+    def ready(self):
+        # Connect the catalog signal receivers and register the catalog mirrors
+        from . import catalog, search_index, suggest  # noqa: F401
+
+        catalog.warn_if_process_local()
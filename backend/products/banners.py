@@ -0,0 +1,63 @@
+"""
+Process-local banner feed for /api/products/auto-scroll-images/.
+
+Banners change rarely, so the active ones are serialized once, grouped by
+placement, and kept in memory. After ``BANNER_FEED_TTL_SECONDS`` the next
+request probes ``count(*)`` and ``max(updated_at)`` of the table (one cheap
+aggregate) and reloads only if that changed. ``auto_scroll_images`` is
+edited outside Django, so there are no signals to invalidate on.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import AutoScrollImage
+from .serializers import AutoScrollImageSerializer
+
+
+class BannerFeed:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.version = None
+        self.banners = []
+        self.by_placement = {}
+        self._checked_at = 0.0
+
+    def probe(self):
+        state = AutoScrollImage.objects.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+        return state['count'], state['updated_at']
+
+    def load(self, version):
+        banners = AutoScrollImageSerializer(
+            AutoScrollImage.objects.filter(is_active=True).order_by('order', 'id'), many=True
+        ).data
+        by_placement = defaultdict(list)
+        for banner in banners:
+            by_placement[banner['placement']].append(banner)
+        self.banners, self.by_placement, self.version = list(banners), dict(by_placement), version
+
+    def ensure_fresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.version is not None and now - self._checked_at < settings.BANNER_FEED_TTL_SECONDS:
+                return
+            version = self.probe()
+            if version != self.version:
+                self.load(version)
+            self._checked_at = now
+
+    def get(self, placement=None):
+        """Active banners in display order, all or for one placement."""
+        self.ensure_fresh()
+        if placement is None:
+            return self.banners
+        return self.by_placement.get(placement, [])
+
+
+banner_feed = BannerFeed()
@@ -0,0 +1,264 @@
+"""
+Catalog version counters and per-process catalog mirrors.
+
+The catalog version is bumped after every committed change to the catalog
+(products, variants, images, stock, vendor names) and drives ETags and the
+search result cache. The mirror version is bumped only when a product's
+mirrored text fields change, or a product is created or deleted. Both are
+stored in the default cache, so they are shared only by the processes that
+share that cache: production must point ``CACHE_BACKEND`` at a shared
+backend (the database cache in render.yaml). With the per-process locmem
+default every worker keeps its own counters and never sees the others'
+writes, which is only correct for a single process (``runserver``, tests);
+``warn_if_process_local()`` logs a warning at startup when DEBUG is off.
+
+Per-process structures derived from the catalog (the search index, the
+suggestion index) subclass ``CatalogMirror``. They are updated
+incrementally for changes made by their own worker, and compare their
+version against the shared mirror version to detect changes made by other
+workers. Stock and price changes therefore never rebuild them.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from users.models import UserProfile
+from .models import Product, ProductImage, ProductVariant
+
+CATALOG_VERSION_KEY = 'catalog:version'
+MIRROR_VERSION_KEY = 'catalog:mirror-version'
+
+# Backends whose values are private to one process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+logger = logging.getLogger(__name__)
+
+_mirrors = []
+
+
+def warn_if_process_local():
+    """Log a warning when the version counters cannot be shared by several workers."""
+    backend = settings.CACHES['default']['BACKEND']
+    if not settings.DEBUG and backend in PROCESS_LOCAL_CACHES:
+        logger.warning(
+            'The default cache (%s) is private to each process: catalog versions, ETags and '
+            'catalog mirrors go stale with more than one worker. Set CACHE_BACKEND to a shared cache.',
+            backend,
+        )
+
+
+def _initial_version():
+    # Millisecond clock: if the key is ever evicted the counter restarts above
+    # any value handed out before, so stale versions are never reused.
+    return int(time.time() * 1000)
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key missing (first write, or evicted)
+        _get_version(key)
+        return cache.incr(key)
+
+
+def get_catalog_version():
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Increment the version and return the new value."""
+    return _bump_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version_on_commit():
+    transaction.on_commit(bump_catalog_version)
+
+
+def get_mirror_version():
+    return _get_version(MIRROR_VERSION_KEY)
+
+
+def bump_mirror_version():
+    return _bump_version(MIRROR_VERSION_KEY)
+
+
+class CatalogMirror:
+    """Base class for per-process structures derived from ``Product`` rows.
+
+    Subclasses set ``fields`` (the Product fields they read) and implement
+    ``load(rows)``, ``upsert(product_id, values)`` and ``remove(product_id)``.
+    """
+
+    fields = ()
+    # Seconds between version probes; 0 checks on every read.
+    refresh_interval = 0
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.version = None
+        self._checked_at = 0.0
+        _mirrors.append(self)
+
+    @property
+    def is_built(self):
+        return self.version is not None
+
+    def build(self):
+        with self._lock:
+            # Read the version first: a write landing mid-build bumps it again
+            # and the next read rebuilds.
+            version = get_mirror_version()
+            rows = Product.objects.values_list('id', *self.fields)
+            self.load(
+                (product_id, dict(zip(self.fields, values)))
+                for product_id, *values in rows.iterator(chunk_size=2000)
+            )
+            self.version = version
+            self._checked_at = time.monotonic()
+
+    def ensure_fresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.is_built and now - self._checked_at < self.refresh_interval:
+                return
+            self._checked_at = now
+            if self.version != get_mirror_version():
+                self.build()
+
+    def sync_version(self):
+        """Adopt the shared version after applying a local change.
+
+        Only valid if our own bump is the single change since the mirror was
+        current; otherwise another worker changed the catalog too and the
+        mirror is marked stale.
+        """
+        with self._lock:
+            if self.version is None:
+                return
+            current = get_mirror_version()
+            self.version = current if current == self.version + 1 else None
+
+    def apply_upsert(self, product_id, values):
+        with self._lock:
+            self.upsert(product_id, values)
+            self.sync_version()
+
+    def apply_remove(self, product_id):
+        with self._lock:
+            self.remove(product_id)
+            self.sync_version()
+
+    def load(self, rows):
+        raise NotImplementedError
+
+    def upsert(self, product_id, values):
+        raise NotImplementedError
+
+    def remove(self, product_id):
+        raise NotImplementedError
+
+
+def _mirrored_fields():
+    return {field for mirror in _mirrors for field in mirror.fields}
+
+
+@receiver(post_init, sender=Product)
+def product_loaded(sender, instance, **kwargs):
+    # The mirrored values as loaded, so a save can tell whether they changed
+    instance._mirrored_values = {
+        field: instance.__dict__[field] for field in _mirrored_fields() if field in instance.__dict__
+    }
+
+
+def _changed_fields(instance, created, update_fields):
+    """The mirrored fields this save changed."""
+    fields = _mirrored_fields()
+    if update_fields is not None:
+        fields &= set(update_fields)
+    if created:
+        return fields
+    loaded = instance._mirrored_values
+    return {
+        field for field in fields
+        if field in instance.__dict__ and (field not in loaded or loaded[field] != instance.__dict__[field])
+    }
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    bump_catalog_version_on_commit()
+    changed = _changed_fields(instance, created, update_fields)
+    product_loaded(sender, instance)
+    if not changed:
+        # e.g. stock, price or rating updates: the mirrors are unaffected
+        return
+    transaction.on_commit(bump_mirror_version)
+
+    product_id = instance.pk
+    for mirror in _mirrors:
+        if not mirror.is_built:
+            continue
+        if not set(mirror.fields) & changed:
+            # Nothing to apply, just follow the version
+            transaction.on_commit(mirror.sync_version)
+            continue
+
+        if set(mirror.fields) & instance.get_deferred_fields():
+            values = Product.objects.filter(pk=product_id).values(*mirror.fields).first()
+            if values is None:
+                continue
+        else:
+            values = {field: getattr(instance, field) for field in mirror.fields}
+        transaction.on_commit(lambda mirror=mirror, values=values: mirror.apply_upsert(product_id, values))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    bump_catalog_version_on_commit()
+    transaction.on_commit(bump_mirror_version)
+
+    product_id = instance.pk
+    for mirror in _mirrors:
+        if mirror.is_built:
+            transaction.on_commit(lambda mirror=mirror: mirror.apply_remove(product_id))
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def related_changed(sender, instance, **kwargs):
+    # Variants and images are not mirrored but still change the catalog
+    catalog_changed()
+
+
+def catalog_changed():
+    """Bump the version for a change the mirrors do not track (e.g. a bulk stock update)."""
+    bump_catalog_version_on_commit()
+
+
+@receiver(post_save, sender=UserProfile)
+def vendor_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Product responses include the vendor's name
+    if created or (update_fields is not None and 'full_name' not in update_fields):
+        return
+    if Product.objects.filter(vendor_id=instance.pk).exists():
+        related_changed(sender, instance)
@@ -0,0 +1,67 @@
+"""
+Conditional GET for the catalog and banner endpoints.
+
+Validators are computed without building the response: product endpoints
+use the shared catalog version (products/catalog.py, bumped on every product,
+variant, image and vendor name change), banners the row count and
+``max(updated_at)`` probed by the banner feed (products/banners.py). The
+ETag also covers the query string and the ``Accept`` header, since they
+change the body. A matching ``If-None-Match`` (or ``If-Modified-Since``)
+gets a 304 with no body.
+"""
+import hashlib
+from functools import partial
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .banners import banner_feed
+from .catalog import get_catalog_version
+
+
+def _etag(request, validator):
+    representation = f"{validator}|{request.get_full_path()}|{request.headers.get('Accept', '')}"
+    return hashlib.md5(representation.encode(), usedforsecurity=False).hexdigest()
+
+
+def catalog_etag(request, *args, **kwargs):
+    return _etag(request, get_catalog_version())
+
+
+def banner_etag(request, *args, **kwargs):
+    # The feed's probe result, so the ETag always matches the body it serves
+    banner_feed.ensure_fresh()
+    count, updated_at = banner_feed.version
+    return _etag(request, f"{count}:{updated_at and updated_at.isoformat()}")
+
+
+def banner_last_modified(request, *args, **kwargs):
+    banner_feed.ensure_fresh()
+    return banner_feed.version[1]
+
+
+def conditional_get(etag_func, last_modified_func=None):
+    """Class decorator: ETag/Last-Modified, 304s and ``Cache-Control`` on a view's GETs."""
+    check = condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+    def decorator(view_class):
+        dispatch = view_class.dispatch
+
+        def conditional_dispatch(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return dispatch(self, request, *args, **kwargs)
+            response = check(partial(dispatch, self))(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                # Errors (404, invalid parameters) are not cacheable representations
+                response.headers.pop('ETag', None)
+                response.headers.pop('Last-Modified', None)
+                return response
+            # Clients may reuse a stored copy for max-age seconds, then must revalidate
+            patch_cache_control(response, max_age=settings.CATALOG_CACHE_MAX_AGE, must_revalidate=True)
+            patch_vary_headers(response, ['Accept'])
+            return response
+
+        view_class.dispatch = conditional_dispatch
+        return view_class
+    return decorator
@@ -0,0 +1,68 @@
+"""
+Structured filters for the product list (/api/products/).
+
+    ?category=Sweets&category=Snacks   exact category, repeat (or comma separate) for several
+    ?min_price=100&max_price=500       price range
+    ?vendor=12                         one vendor's products
+    ?min_rating=4                      average rating at least
+    ?in_stock=true                     available stock > 0, i.e. stock_quantity > reserved_quantity
+                                       (false: sold out or entirely held by carts)
+
+Every other filter is a plain comparison on a column, so the planner can use
+the B-tree indexes on products (category, vendor, price, ...).
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+
+TRUE_VALUES = {'1', 'true', 'yes'}
+FALSE_VALUES = {'0', 'false', 'no'}
+
+
+def _decimal(params, name):
+    try:
+        value = Decimal(params[name])
+    except InvalidOperation:
+        raise ValidationError({name: 'A valid number is required.'})
+    if not value.is_finite():
+        raise ValidationError({name: 'A valid number is required.'})
+    return value
+
+
+def filter_products(queryset, params):
+    """Apply the filters present in ``params`` (a QueryDict) to ``queryset``."""
+    categories = [
+        category.strip()
+        for value in params.getlist('category')
+        for category in value.split(',')
+        if category.strip()
+    ]
+    if len(categories) == 1:
+        queryset = queryset.filter(category=categories[0])
+    elif categories:
+        queryset = queryset.filter(category__in=categories)
+
+    if params.get('min_price'):
+        queryset = queryset.filter(price__gte=_decimal(params, 'min_price'))
+    if params.get('max_price'):
+        queryset = queryset.filter(price__lte=_decimal(params, 'max_price'))
+    if params.get('min_rating'):
+        queryset = queryset.filter(average_rating__gte=_decimal(params, 'min_rating'))
+
+    if params.get('vendor'):
+        try:
+            vendor_id = int(params['vendor'])
+        except ValueError:
+            raise ValidationError({'vendor': 'A valid integer is required.'})
+        queryset = queryset.filter(vendor_id=vendor_id)
+
+    in_stock = params.get('in_stock', '').lower()
+    if in_stock in TRUE_VALUES:
+        queryset = queryset.filter(stock_quantity__gt=F('reserved_quantity'))
+    elif in_stock in FALSE_VALUES:
+        queryset = queryset.filter(stock_quantity__lte=F('reserved_quantity'))
+    elif in_stock:
+        raise ValidationError({'in_stock': 'Must be true or false.'})
+
+    return queryset
@@ -0,0 +1,278 @@
+"""
+Benchmark the catalog endpoints against the current database.
+
+    python manage.py benchmark_catalog --output bench.json
+    python manage.py benchmark_catalog --baseline bench.json
+
+Runs a fixed mix of requests through the URL resolver (product list with
+search and orderings, product detail, vendor products) and reports per
+scenario p50/p95 latency, the number of SQL queries, the query plans and
+sequential scans and, on PostgreSQL, the number of rows scanned. Plans come
+from EXPLAIN (EXPLAIN ANALYZE on PostgreSQL) of one execution per distinct
+SQL statement (parameters aside), weighted by how often that statement ran.
+
+To see what an index migration changes, benchmark with the migration
+unapplied (``migrate products <previous>``), then again after ``migrate``
+with ``--baseline`` pointing at the first run.
+
+Use a catalog from ``generate_catalog`` so runs are comparable.
+"""
+import json
+import math
+import platform
+import random
+import statistics
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import urlencode
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.urls import resolve
+
+from products.models import Product
+from products.search import get_search_backend
+
+SEARCH_QUERIES = ['rice', 'chicken biryani', 'sweets', 'organic dal', 'ragi flour']
+ORDERINGS = ['-created_at', 'price', '-rating_count']
+CATEGORIES = ['Sweets', 'Pulses', 'Biryani', 'Millets']
+
+
+class QueryRecorder:
+    """Execute wrapper recording every statement with its parameters."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the product list/detail/vendor endpoints and write JSON results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per scenario')
+        parser.add_argument('--warmup', type=int, default=1, help='Untimed runs per scenario')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for picking products and vendors')
+        parser.add_argument('--only', default='', help='Comma separated scenario name prefixes to run')
+        parser.add_argument('--search-cache', action='store_true', help='Keep the search result cache enabled')
+        parser.add_argument('--no-explain', action='store_true', help='Skip EXPLAIN (plans, rows scanned)')
+        parser.add_argument('--plans', action='store_true', help='Print query plans')
+        parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+
+    def handle(self, *args, **options):
+        product_count = Product.objects.count()
+        if not product_count:
+            raise CommandError('No products; run generate_catalog first.')
+
+        scenarios = self._scenarios(random.Random(options['seed']))
+        if options['only']:
+            prefixes = tuple(options['only'].split(','))
+            scenarios = [scenario for scenario in scenarios if scenario[0].startswith(prefixes)]
+
+        explain = not options['no_explain']
+        overrides = {'DEBUG': False}
+        if not options['search_cache']:
+            overrides['PRODUCT_SEARCH_CACHE_ENABLED'] = False
+
+        results = []
+        with override_settings(**overrides):
+            for name, paths in scenarios:
+                result = self._run(name, paths, options['repeat'], options['warmup'], explain)
+                results.append(result)
+                self.stderr.write(
+                    f"{name:<28} p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  "
+                    f"{result['queries']:>6} queries  {result['seq_scans']} seq scans"
+                )
+                if options['plans']:
+                    for plan in result['plans']:
+                        self.stderr.write(f"    x{plan['count']}")
+                        self.stderr.write('\n'.join('      ' + line for line in plan['plan']))
+
+        report = {
+            'meta': {
+                'commit': _git_commit(),
+                'timestamp': datetime.now(dt_timezone.utc).isoformat(),
+                'database': connection.vendor,
+                'products': product_count,
+                'search_backend': get_search_backend(),
+                'search_cache': options['search_cache'],
+                'repeat': options['repeat'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'scenarios': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(output)
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                self._compare(json.load(f), report)
+
+    def _scenarios(self, rng):
+        """(name, [paths]) pairs; a scenario with several paths cycles through them."""
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:10000])
+        vendor_ids = list(
+            Product.objects.order_by('vendor_id').values_list('vendor_id', flat=True).distinct()[:1000]
+        )
+        detail_ids = rng.sample(product_ids, min(20, len(product_ids)))
+        vendors = rng.sample(vendor_ids, min(5, len(vendor_ids)))
+
+        scenarios = [('list', ['/api/products/'])]
+        scenarios += [(f'list_ordering:{ordering}', [f'/api/products/?ordering={ordering}']) for ordering in ORDERINGS]
+        scenarios += [(f'list_page:{ordering}', [f'/api/products/?ordering={ordering}&limit=20']) for ordering in ORDERINGS]
+        scenarios.append(('list_card_page', ['/api/products/?view=card&limit=20']))
+        scenarios.append(('category_page', [f"/api/products/?{urlencode({'category': category, 'limit': 20})}" for category in CATEGORIES]))
+        scenarios.append(('filter_page', [
+            '/api/products/?min_price=100&max_price=500&min_rating=3&in_stock=true&limit=20',
+        ]))
+        scenarios += [(f'search:{query}', [f"/api/products/?{urlencode({'search': query})}"]) for query in SEARCH_QUERIES]
+        scenarios.append(('detail', [f'/api/products/{pk}/' for pk in detail_ids]))
+        scenarios.append(('vendor', [f'/api/products/vendor/{pk}/' for pk in vendors]))
+        scenarios.append(('vendor_page', [f'/api/products/vendor/{pk}/?limit=20' for pk in vendors]))
+        return scenarios
+
+    def _run(self, name, paths, repeat, warmup, explain):
+        factory = RequestFactory()
+
+        def call(path):
+            match = resolve(path.split('?')[0])
+            response = match.func(factory.get(path), *match.args, **match.kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return match, response
+
+        for i in range(warmup):
+            call(paths[i % len(paths)])
+
+        timings = []
+        for i in range(repeat):
+            path = paths[i % len(paths)]
+            start = time.perf_counter()
+            call(path)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        # One extra run, outside the timings, to count and explain queries
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            match, response = call(paths[0])
+        queries = recorder.queries
+
+        return {
+            'name': name,
+            'path': paths[0],
+            'view': getattr(match.func, 'view_class', match.func).__name__,
+            'status': response.status_code,
+            'response_bytes': len(response.content),
+            'p50_ms': round(_percentile(timings, 50), 3),
+            'p95_ms': round(_percentile(timings, 95), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'queries': len(queries),
+            **(_explain(queries) if explain else {'rows_scanned': None, 'seq_scans': None, 'plans': []}),
+        }
+
+    def _compare(self, baseline, report):
+        previous = {scenario['name']: scenario for scenario in baseline['scenarios']}
+        self.stderr.write(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'}:")
+        for scenario in report['scenarios']:
+            before = previous.get(scenario['name'])
+            if before is None:
+                continue
+            change = (scenario['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+            self.stderr.write(
+                f"{scenario['name']:<28} p50 {before['p50_ms']:>9.2f} -> {scenario['p50_ms']:>9.2f} ms ({change:+.1f}%)  "
+                f"queries {before['queries']} -> {scenario['queries']}  "
+                f"seq scans {before.get('seq_scans')} -> {scenario['seq_scans']}"
+            )
+
+
+def _percentile(values, percent):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def _explain(queries):
+    """Plans of the distinct SELECT statements, their sequential scans and rows scanned.
+
+    PostgreSQL runs EXPLAIN ANALYZE (rows scanned are actual counts); SQLite
+    only has EXPLAIN QUERY PLAN, so rows scanned is None there.
+    """
+    counts = Counter()
+    examples = {}
+    for sql, params in queries:
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        counts[sql] += 1
+        examples.setdefault(sql, params)
+
+    postgres = connection.vendor == 'postgresql'
+    plans, rows, seq_scans = [], 0, 0
+    with connection.cursor() as cursor:
+        for sql, count in counts.items():
+            if postgres:
+                cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, examples[sql])
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                root = plan[0]['Plan']
+                lines = _plan_lines(root)
+                rows += _plan_rows(root) * count
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, examples[sql])
+                lines = [row[-1] for row in cursor.fetchall()]
+            seq_scans += sum(_is_seq_scan(line) for line in lines) * count
+            plans.append({'count': count, 'plan': lines})
+    return {'rows_scanned': rows if postgres else None, 'seq_scans': seq_scans, 'plans': plans}
+
+
+def _plan_lines(node, depth=0):
+    line = node['Node Type']
+    if 'Index Name' in node:
+        line += f" using {node['Index Name']}"
+    if 'Relation Name' in node:
+        line += f" on {node['Relation Name']}"
+    lines = ['  ' * depth + line]
+    for child in node.get('Plans', ()):
+        lines += _plan_lines(child, depth + 1)
+    return lines
+
+
+def _is_seq_scan(line):
+    line = line.strip()
+    # SQLite: "SCAN products" is a full table scan, "SCAN products USING INDEX ..." is not
+    return line.startswith('Seq Scan') or (line.startswith('SCAN ') and ' USING ' not in line)
+
+
+def _plan_rows(node):
+    rows = 0
+    # Bitmap index scans only produce TIDs; their heap scan counts the rows
+    if 'Scan' in node['Node Type'] and node['Node Type'] != 'Bitmap Index Scan':
+        rows = (
+            node.get('Actual Rows', 0)
+            + node.get('Rows Removed by Filter', 0)
+            + node.get('Rows Removed by Index Recheck', 0)
+        ) * node.get('Actual Loops', 1)
+    return rows + sum(_plan_rows(child) for child in node.get('Plans', ()))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
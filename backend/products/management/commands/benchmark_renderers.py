@@ -0,0 +1,51 @@
+"""
+Benchmark response encoding for a catalog page.
+
+    python manage.py benchmark_renderers --products 500
+
+Serializes the first ``--products`` products once, then times encoding that
+data with DRF's stdlib JSON renderer, the msgspec JSON renderer and the
+MessagePack renderer, reporting p50 encode time and payload size.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import renderers
+
+from products.models import Product
+from products.serializers import ProductSerializer
+from shaaka_backend.renderers import JSONRenderer, MessagePackRenderer, msgspec
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON/MessagePack encode time and size for a catalog response'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500, help='Products in the response')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per renderer')
+
+    def handle(self, *args, **options):
+        if msgspec is None:
+            raise CommandError('msgspec is not installed.')
+        products = Product.objects.for_serializer().order_by('id')[:options['products']]
+        data = ProductSerializer(products, many=True).data
+        if not data:
+            raise CommandError('No products; run generate_catalog first.')
+
+        baseline = None
+        for name, renderer in [
+            ('json (stdlib)', renderers.JSONRenderer()),
+            ('json (msgspec)', JSONRenderer()),
+            ('msgpack', MessagePackRenderer()),
+        ]:
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                body = renderer.render(data, renderer.media_type, {})
+                timings.append((time.perf_counter() - start) * 1000)
+            p50 = statistics.median(timings)
+            baseline = baseline or p50
+            self.stdout.write(
+                f'{name:<15} {len(data)} products  {p50:8.3f} ms ({baseline / p50:4.1f}x)  {len(body):>9} bytes'
+            )
@@ -0,0 +1,66 @@
+"""
+Microbenchmark: DRF serializers against the compiled values() path.
+
+    python manage.py benchmark_serialization --products 1000
+
+Renders the same products (full and card representation) to JSON both
+ways, checks the bytes are identical and reports p50 timings. Queries are
+included, as they differ between the two paths (instances with prefetches
+versus value rows).
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from products.models import Product
+from products.serializers import ProductCardSerializer, ProductSerializer
+from shaaka_backend.compiled_serializers import compile_serializer
+
+
+class Command(BaseCommand):
+    help = 'Compare ProductSerializer with the compiled serializer on the current catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000, help='Products rendered per run')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per path')
+
+    def handle(self, *args, **options):
+        ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:options['products']])
+        if not ids:
+            raise CommandError('No products; run generate_catalog first.')
+        renderer = JSONRenderer()
+
+        for label, serializer_class, fields in [
+            ('full', ProductSerializer, None),
+            ('card', ProductCardSerializer, tuple(ProductCardSerializer.Meta.fields)),
+        ]:
+            def queryset():
+                return Product.objects.for_serializer(fields).filter(id__in=ids).order_by('id')
+
+            def drf():
+                context = {'fields': list(fields)} if fields is not None else {}
+                return renderer.render(serializer_class(queryset(), many=True, context=context).data)
+
+            def compiled():
+                serializer = compile_serializer(serializer_class, fields)
+                return renderer.render(serializer.serialize(serializer.values(queryset())))
+
+            if drf() != compiled():
+                raise CommandError(f'{label}: compiled output differs from {serializer_class.__name__}')
+
+            before, after = _time(drf, options['repeat']), _time(compiled, options['repeat'])
+            self.stdout.write(
+                f'{label:<5} {len(ids)} products  {serializer_class.__name__} {before:9.2f} ms  '
+                f'compiled {after:9.2f} ms  ({before / after:.1f}x)'
+            )
+
+
+def _time(render, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
@@ -0,0 +1,188 @@
+"""
+Generate a reproducible synthetic catalog for benchmarking.
+
+    python manage.py generate_catalog --products 100000 --seed 42
+
+The same --products/--seed always produce the same rows. Generated vendors
+and customers have mobile numbers starting with ``bench-`` and can be
+removed (with everything hanging off them) using --clear.
+"""
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from products.catalog import bump_catalog_version
+from products.models import Product, ProductImage, ProductReview, ProductVariant, WishlistItem
+from shaaka_backend.db import create_unmanaged_tables
+from users.models import UserProfile
+
+MOBILE_PREFIX = 'bench-'
+
+CATEGORY_ITEMS = {
+    'Fruits': ['Mango', 'Banana', 'Guava', 'Papaya', 'Pomegranate', 'Sapota', 'Custard Apple'],
+    'Vegetables': ['Tomato', 'Brinjal', 'Okra', 'Drumstick', 'Gongura', 'Bottle Gourd', 'Spinach'],
+    'Dairy': ['Milk', 'Curd', 'Paneer', 'Ghee', 'Butter', 'Buttermilk'],
+    'Grains': ['Wheat', 'Broken Wheat', 'Maize', 'Barley'],
+    'Spices': ['Turmeric', 'Chilli Powder', 'Garam Masala', 'Coriander Powder', 'Pepper'],
+    'Veg starters': ['Paneer Tikka', 'Gobi Manchurian', 'Veg Spring Roll', 'Corn Fry'],
+    'Non Veg starters': ['Chicken 65', 'Apollo Fish', 'Chilli Chicken', 'Mutton Fry'],
+    'Biryani': ['Chicken Biryani', 'Mutton Biryani', 'Veg Biryani', 'Egg Biryani', 'Prawn Biryani'],
+    'Pulao': ['Veg Pulao', 'Kaju Pulao', 'Peas Pulao'],
+    'Veg thali': ['Andhra Veg Thali', 'Mini Meals', 'South Indian Thali'],
+    'Non veg Thali': ['Chicken Thali', 'Fish Thali', 'Mutton Thali'],
+    'Sweets': ['Kaju Barfi', 'Bobbatlu', 'Ariselu', 'Putharekulu', 'Besan Ladoo', 'Jalebi'],
+    'Snacks': ['Chekkalu', 'Murukku', 'Banana Chips', 'Mixture', 'Chegodilu'],
+    'Dry fruits': ['Cashew', 'Almond', 'Raisins', 'Dates', 'Pista'],
+    'Tiffins': ['Idli', 'Dosa', 'Pesarattu', 'Upma', 'Vada', 'Poori'],
+    'Drinks': ['Lassi', 'Badam Milk', 'Lemon Soda', 'Sugarcane Juice'],
+    'Desserts': ['Double Ka Meetha', 'Qubani Ka Meetha', 'Payasam', 'Kulfi'],
+    'Millets': ['Foxtail Millet', 'Little Millet', 'Ragi', 'Jowar', 'Bajra'],
+    'Pulses': ['Toor Dal', 'Moong Dal', 'Chana Dal', 'Urad Dal', 'Masoor Dal'],
+    'Flours': ['Jowar Flour', 'Ragi Flour', 'Rice Flour', 'Besan', 'Wheat Atta'],
+    'Tea Powders': ['Masala Chai', 'Green Tea', 'Assam Tea', 'Filter Coffee'],
+    'Rice': ['Basmati Rice', 'Sona Masoori', 'Brown Rice', 'Idli Rice'],
+    'Oils': ['Groundnut Oil', 'Sesame Oil', 'Coconut Oil', 'Sunflower Oil'],
+    'Others': ['Pickle', 'Papad', 'Honey', 'Jaggery', 'Tamarind'],
+}
+
+QUALIFIERS = ['', 'Organic', 'Homemade', 'Fresh', 'Premium', 'Village', 'Traditional', 'Special']
+DESCRIPTION_WORDS = [
+    'handmade', 'fresh', 'authentic', 'andhra', 'telangana', 'spicy', 'sweet', 'traditional',
+    'healthy', 'organic', 'farm', 'home', 'style', 'recipe', 'pure', 'natural', 'crispy', 'soft',
+]
+UNITS = ['kg', 'g', 'litre', 'piece', 'pack', 'plate']
+VARIANT_QUANTITIES = [Decimal('0.25'), Decimal('0.5'), Decimal('1'), Decimal('2'), Decimal('5')]
+
+# Fixed reference point so created_at values do not depend on when the command ran
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class Command(BaseCommand):
+    help = 'Generate a reproducible synthetic catalog (vendors, products, variants, images, reviews)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000, help='Number of products (e.g. 10000, 100000, 1000000)')
+        parser.add_argument('--vendors', type=int, default=None, help='Number of vendors (default: one per 100 products)')
+        parser.add_argument('--customers', type=int, default=500, help='Number of reviewing customers')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated data first')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        product_count = options['products']
+        vendor_count = options['vendors'] or max(product_count // 100, 1)
+        customer_count = max(options['customers'], 1)
+
+        # Unmanaged tables are not created by migrate (fresh SQLite databases)
+        create_unmanaged_tables(connection.alias)
+
+        if options['clear']:
+            self._clear()
+        elif UserProfile.objects.filter(mobile_number__startswith=MOBILE_PREFIX).exists():
+            self.stderr.write('Generated data already exists; pass --clear to replace it.')
+            return
+
+        with transaction.atomic():
+            vendors = self._create_users(vendor_count, 'v', 'Vendor')
+            customers = self._create_users(customer_count, 'c', 'Customer')
+
+        created = 0
+        batch_size = options['batch_size']
+        while created < product_count:
+            size = min(batch_size, product_count - created)
+            with transaction.atomic():
+                self._create_batch(rng, created, size, vendors, customers)
+            created += size
+            self.stdout.write(f'{created}/{product_count} products')
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        # bulk_create sends no signals: invalidate catalog caches explicitly
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {product_count} products for {vendor_count} vendors (seed {options["seed"]})'
+        ))
+
+    def _create_users(self, count, kind, category):
+        users = [
+            UserProfile(
+                full_name=f'Bench {category} {i}',
+                mobile_number=f'{MOBILE_PREFIX}{kind}{i}',
+                password_hash='!',
+                category=category,
+                city='Hyderabad',
+                created_at=EPOCH,
+                updated_at=EPOCH,
+            )
+            for i in range(count)
+        ]
+        UserProfile.objects.bulk_create(users, batch_size=1000)
+        return [user.pk for user in users]
+
+    def _create_batch(self, rng, offset, size, vendors, customers):
+        products, reviews_by_product = [], []
+        for i in range(offset, offset + size):
+            category = rng.choice(Product.CATEGORY_CHOICES)[0]
+            name = f'{rng.choice(QUALIFIERS)} {rng.choice(CATEGORY_ITEMS[category])}'.strip()
+            price = Decimal(rng.randrange(2000, 200000)) / 100
+            created_at = EPOCH + timedelta(seconds=rng.randrange(0, 730 * 86400))
+            ratings = [rng.randint(1, 5) for _ in range(min(rng.choice((0, 0, 1, 2, 3, 5, 8)), len(customers)))]
+            products.append(Product(
+                vendor_id=rng.choice(vendors),
+                name=name,
+                description=' '.join(rng.sample(DESCRIPTION_WORDS, 6)) + f' {name.lower()} #{i}',
+                category=category,
+                price=price,
+                unit=rng.choice(UNITS),
+                stock_quantity=Decimal(rng.randrange(0, 500)),
+                average_rating=(Decimal(sum(ratings)) / len(ratings)).quantize(Decimal('0.01')) if ratings else Decimal('0'),
+                rating_count=len(ratings),
+                created_at=created_at,
+                updated_at=created_at,
+            ))
+            reviews_by_product.append(ratings)
+
+        # Primary keys are set on the instances (RETURNING on Postgres and SQLite)
+        Product.objects.bulk_create(products)
+
+        variants, images, reviews = [], [], []
+        for product, ratings in zip(products, reviews_by_product):
+            for quantity in sorted(rng.sample(VARIANT_QUANTITIES, rng.randint(1, 3))):
+                variants.append(ProductVariant(
+                    product=product, quantity=quantity, unit=product.unit,
+                    price=(product.price * quantity).quantize(Decimal('0.01')),
+                    stock_quantity=Decimal(rng.randrange(0, 100)),
+                ))
+            for n in range(rng.randint(1, 3)):
+                images.append(ProductImage(
+                    product=product, image_url=f'https://img.example.com/products/{product.pk}/{n}.jpg',
+                    created_at=product.created_at,
+                ))
+            for user_id, rating in zip(rng.sample(customers, len(ratings)), ratings):
+                reviews.append(ProductReview(
+                    product=product, user_id=user_id, rating=rating, comment='Generated review',
+                    created_at=product.created_at + timedelta(days=rng.randrange(1, 60)),
+                ))
+
+        ProductVariant.objects.bulk_create(variants)
+        ProductImage.objects.bulk_create(images)
+        ProductReview.objects.bulk_create(reviews)
+
+    def _clear(self):
+        # Plain SQL: deleting through the ORM would fire per-row signals for
+        # every product and variant.
+        users = f'SELECT id FROM {UserProfile._meta.db_table} WHERE mobile_number LIKE %s'
+        products = f'SELECT id FROM {Product._meta.db_table} WHERE vendor_id IN ({users})'
+        pattern = [MOBILE_PREFIX + '%']
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model in (ProductVariant, ProductImage, ProductReview, WishlistItem):
+                cursor.execute(f'DELETE FROM {model._meta.db_table} WHERE product_id IN ({products})', pattern)
+            cursor.execute(f'DELETE FROM {ProductReview._meta.db_table} WHERE user_id IN ({users})', pattern)
+            cursor.execute(f'DELETE FROM {Product._meta.db_table} WHERE vendor_id IN ({users})', pattern)
+            cursor.execute(f'DELETE FROM {UserProfile._meta.db_table} WHERE mobile_number LIKE %s', pattern)
+        bump_catalog_version()
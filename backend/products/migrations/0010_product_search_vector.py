@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Weighted tsvector kept up to date by Postgres itself (stored generated column),
+# so every write path - ORM, bulk_create, admin, raw SQL - stays in sync.
+# Weights: A = name, B = category, C = description.
+FORWARD_SQL = [
+    """
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(category, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS products_search_vector_gin ON products USING gin (search_vector)",
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS products_search_vector_gin",
+    "ALTER TABLE products DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_on_postgres(statements):
+    def operation(apps, schema_editor):
+        # Full-text search is Postgres-only; other databases use the basic backend.
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0009_wishlistitem"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgres(FORWARD_SQL), run_on_postgres(REVERSE_SQL)),
+    ]
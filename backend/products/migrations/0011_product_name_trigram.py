@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Trigram GIN index for the fuzzy search backend (name %> term).
+FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS products_name_trgm_gin ON products USING gin (name gin_trgm_ops)",
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS products_name_trgm_gin",
+]
+
+
+def run_on_postgres(statements):
+    def operation(apps, schema_editor):
+        # Trigram search is Postgres-only; other databases use the basic backend.
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                # Server built without contrib; fuzzy search is unavailable there.
+                return
+        for sql in statements:
+            schema_editor.execute(sql)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0010_product_search_vector"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgres(FORWARD_SQL), run_on_postgres(REVERSE_SQL)),
+    ]
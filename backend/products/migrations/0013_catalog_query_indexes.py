@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-18 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_ordering_indexes'),
+        ('users', '0004_useraddress_google_maps_link'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['vendor', 'created_at', 'id'], name='products_vendor_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productreview',
+            index=models.Index(fields=['product', 'created_at', 'id'], name='reviews_product_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['product', 'quantity'], name='variants_product_qty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wishlistitem',
+            index=models.Index(fields=['user', 'added_at'], name='wishlist_user_added_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_catalog_query_indexes'),
+        ('users', '0004_useraddress_google_maps_link'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'created_at', 'id'], name='products_category_created_idx'),
+        ),
+    ]
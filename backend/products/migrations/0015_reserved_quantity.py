@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-18 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_product_category_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reserved_quantity',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='reserved_quantity',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=10),
+        ),
+    ]
@@ -3,7 +3,68 @@ from django.utils import timezone
 from users.models import UserProfile
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import Avg, Count
+from django.db.models import Avg, Count, F, OuterRef, Prefetch, Subquery
+
+# Columns always loaded, even for sparse field sets: cheap, and read as
+# keyset pagination cursors (shaaka_backend/pagination.py).
+PRODUCT_KEY_COLUMNS = ('id', 'created_at', 'price', 'average_rating', 'rating_count')
+
+# Stock not held by carts (orders/reservations.py), for products and variants
+AVAILABLE_QUANTITY = F('stock_quantity') - F('reserved_quantity')
+
+
+def first_image_url(product='pk'):
+    """Subquery for the URL of the first image of the product in the outer query's ``product`` column."""
+    images = ProductImage.objects.filter(product=OuterRef(product)).order_by('id')
+    return Subquery(images.values('image_url')[:1])
+
+
+def _keep_reserved_quantity(instance, kwargs):
+    # reserved_quantity only changes through F() updates (orders/stock.py); a
+    # full save() of a loaded row must not write back a stale count.
+    if not instance._state.adding and kwargs.get('update_fields') is None:
+        deferred = instance.get_deferred_fields()
+        kwargs['update_fields'] = [
+            field.name for field in instance._meta.concrete_fields
+            if not field.primary_key and field.name != 'reserved_quantity' and field.attname not in deferred
+        ]
+
+
+def _ordered_relation(name):
+    # Images and variants render in id order, like shaaka_backend/compiled_serializers.py
+    model = {'images': ProductImage, 'variants': ProductVariant}[name]
+    return Prefetch(name, queryset=model.objects.order_by('id'))
+
+
+class ProductQuerySet(models.QuerySet):
+    def for_serializer(self, fields=None):
+        """Load what a product serializer reads for ``fields`` (default: everything) up front.
+
+        Only the requested columns are selected; relations are joined or
+        prefetched only when a field needs them, and ``thumbnail`` is
+        fetched with a subquery instead of prefetching every image.
+        """
+        if fields is None:
+            return self.select_related('vendor').prefetch_related(_ordered_relation('images'), _ordered_relation('variants'))
+
+        columns = {field.name for field in Product._meta.concrete_fields}
+        queryset = self
+        only = [field for field in fields if field in columns]
+        if 'available_quantity' in fields:
+            only += ['stock_quantity', 'reserved_quantity']
+        if 'vendor_name' in fields:
+            queryset = queryset.select_related('vendor')
+            only += ['vendor', 'vendor__full_name']
+        queryset = queryset.prefetch_related(*[_ordered_relation(field) for field in ('images', 'variants') if field in fields])
+        if 'thumbnail' in fields:
+            queryset = queryset.annotate(thumbnail=first_image_url())
+        return queryset.only(*PRODUCT_KEY_COLUMNS, *only)
+
+
+def prefetch_products(lookup):
+    """Prefetch a relation ending in Product (e.g. 'items__product') ready for ProductSerializer."""
+    return Prefetch(lookup, queryset=Product.objects.for_serializer())
+
 
 class Product(models.Model):
     CATEGORY_CHOICES = [
@@ -41,6 +102,8 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     unit = models.CharField(max_length=50)
     stock_quantity = models.DecimalField(max_digits=10, decimal_places=3, default=0)
+    # Held by carts (orders/reservations.py): available stock is stock_quantity - reserved_quantity
+    reserved_quantity = models.DecimalField(max_digits=10, decimal_places=3, default=0)
     
     # Denormalized rating fields for performance
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
@@ -49,12 +112,35 @@ class Product(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(default=timezone.now)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         db_table = 'products'
+        # Keyset pagination keys for the list orderings, see shaaka_backend/pagination.py
+        # (btree indexes are scanned backwards for descending orders)
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='products_created_id_idx'),
+            models.Index(fields=['price', 'id'], name='products_price_id_idx'),
+            models.Index(fields=['average_rating', 'id'], name='products_avg_rating_id_idx'),
+            models.Index(fields=['rating_count', 'id'], name='products_rating_count_id_idx'),
+            # Vendor product list: WHERE vendor_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['vendor', 'created_at', 'id'], name='products_vendor_created_idx'),
+            # Category tiles: WHERE category = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['category', 'created_at', 'id'], name='products_category_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def available_quantity(self):
+        """Stock not held by carts (see AVAILABLE_QUANTITY)."""
+        return self.stock_quantity - self.reserved_quantity
+
+    def save(self, *args, **kwargs):
+        _keep_reserved_quantity(self, kwargs)
+        super().save(*args, **kwargs)
+
 class ProductImage(models.Model):
     id = models.BigAutoField(primary_key=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
@@ -71,9 +157,23 @@ class ProductVariant(models.Model):
     unit = models.CharField(max_length=50)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock_quantity = models.DecimalField(max_digits=10, decimal_places=3, default=0)
+    reserved_quantity = models.DecimalField(max_digits=10, decimal_places=3, default=0)
 
     class Meta:
         db_table = 'product_variants'
+        # Cart and order paths look variants up by (product, quantity)
+        indexes = [
+            models.Index(fields=['product', 'quantity'], name='variants_product_qty_idx'),
+        ]
+
+    @property
+    def available_quantity(self):
+        """Stock not held by carts (see AVAILABLE_QUANTITY)."""
+        return self.stock_quantity - self.reserved_quantity
+
+    def save(self, *args, **kwargs):
+        _keep_reserved_quantity(self, kwargs)
+        super().save(*args, **kwargs)
 
 class ProductReview(models.Model):
     id = models.BigAutoField(primary_key=True)
@@ -86,6 +186,9 @@ class ProductReview(models.Model):
     class Meta:
         db_table = 'product_reviews'
         unique_together = ('product', 'user')  # One review per user per product
+        indexes = [
+            models.Index(fields=['product', 'created_at', 'id'], name='reviews_product_created_idx'),
+        ]
 
 # Signals to update Product stats
 @receiver(post_save, sender=ProductReview)
@@ -127,6 +230,9 @@ class WishlistItem(models.Model):
     class Meta:
         db_table = 'wishlist_items'
         unique_together = ('user', 'product')
+        indexes = [
+            models.Index(fields=['user', 'added_at'], name='wishlist_user_added_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.full_name} - {self.product.name}"
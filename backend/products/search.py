@@ -0,0 +1,380 @@
+"""Product search used by the ``?search=`` param of the product list."""
+import re
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+
+from .models import Product
+from .search_index import catalog_index
+
+# Smart category synonyms mapped to Category enum
+SEARCH_SYNONYMS = {
+    # Snacks & Sweets
+    'snack': ['Snacks', 'Sweets', 'Dry fruits', 'Veg starters', 'Non Veg starters', 'chat', 'namkeen', 'chips', 'biscuit', 'cookies', 'mixture', 'bhujia', 'mathri'],
+    'sweet': ['Sweets', 'Desserts', 'mithai', 'halwa', 'ladoo', 'barfi', 'pedha', 'jalebi', 'gulab jamun', 'rasgulla', 'chikki'],
+    'dessert': ['Sweets', 'Desserts', 'ice cream', 'cake', 'pastry'],
+
+    # Vegetables & Fruits
+    'veg': ['Vegetables', 'Veg starters', 'Veg thali', 'Pulao', 'greens', 'sabzi', 'tarkari'],
+    'vegetable': ['Vegetables', 'Veg starters', 'Veg thali', 'Pulao', 'greens', 'sabzi', 'tarkari'],
+    'fruit': ['Fruits', 'Dry fruits', 'phal', 'fresh fruit'],
+    'dry fruit': ['Dry fruits', 'nuts', 'badam', 'kaju', 'pista', 'kismis', 'almond', 'cashew', 'raisin', 'walnut', 'dates'],
+    'nut': ['Dry fruits', 'nuts', 'badam', 'kaju', 'pista', 'kismis', 'almond', 'cashew', 'raisin', 'walnut', 'dates'],
+
+    # Meat & Non-Veg
+    'nonveg': ['Non Veg starters', 'Non veg Thali', 'Biryani', 'meat', 'chicken', 'mutton', 'fish', 'egg', 'seafood'],
+    'meat': ['Non Veg starters', 'Non veg Thali', 'Biryani', 'chicken', 'mutton', 'fish', 'egg', 'seafood'],
+    'chicken': ['Non Veg starters', 'Non veg Thali', 'Biryani', 'poultry', 'murgh'],
+    'mutton': ['Non Veg starters', 'Non veg Thali', 'Biryani', 'lamb', 'goat', 'gosht'],
+    'fish': ['Non Veg starters', 'Non veg Thali', 'Biryani', 'seafood', 'prawn', 'crab', 'machli'],
+    'egg': ['Non Veg starters', 'Non veg Thali', 'Biryani', 'anda'],
+
+    # Drinks & Beverages
+    'drink': ['Drinks', 'Tea Powders', 'beverage', 'juice', 'soda', 'cool drink', 'water', 'lassi', 'buttermilk', 'chai', 'coffee'],
+    'beverage': ['Drinks', 'Tea Powders', 'juice', 'soda', 'cool drink', 'water', 'lassi', 'buttermilk', 'chai', 'coffee'],
+    'tea': ['Drinks', 'Tea Powders', 'chai', 'green tea', 'black tea'],
+    'coffee': ['Drinks', 'Tea Powders', 'filter coffee', 'instant coffee'],
+
+    # Groceries (Staples)
+    'grocery': ['Grains', 'Pulses', 'Flours', 'Rice', 'Oils', 'Spices', 'Millets', 'staple', 'pantry', 'kirana', 'provisions'],
+    'staple': ['Grains', 'Pulses', 'Flours', 'Rice', 'Oils', 'Spices', 'Millets', 'pantry', 'kirana', 'provisions'],
+    'grain': ['Grains', 'Rice', 'Millets', 'wheat', 'gehu', 'jowar', 'bajra', 'oats'],
+    'pulse': ['Pulses', 'dal', 'dhal', 'lentil', 'chana', 'moong', 'toor', 'urad', 'masoor', 'rajma', 'chole', 'lobia', 'peas', 'beans', 'gram'],
+    'dal': ['Pulses', 'dhal', 'lentil', 'chana', 'moong', 'toor', 'urad', 'masoor', 'rajma', 'chole'],
+    'lentil': ['Pulses', 'dal', 'dhal', 'chana', 'moong', 'toor', 'urad', 'masoor', 'rajma', 'chole'],
+    'flour': ['Flours', 'atta', 'maida', 'besan', 'sooji', 'rawa', 'wheat flour', 'rice flour', 'corn flour'],
+    'atta': ['Flours', 'wheat flour'],
+    'rice': ['Rice', 'chawal', 'basmati', 'sona masuri', 'raw rice', 'boiled rice', 'brown rice', 'poha', 'murmure'],
+    'oil': ['Oils', 'tel', 'cooking oil', 'sunflower oil', 'groundnut oil', 'mustard oil', 'coconut oil', 'sesame oil', 'ghee'],
+    'ghee': ['Oils', 'Dairy', 'clarified butter'],
+    'spice': ['Spices', 'masala', 'mirchi', 'haldi', 'dhaniya', 'jeera', 'mustard seeds', 'rai', 'methi', 'elaichi', 'clove', 'cinnamon', 'pepper', 'garam masala'],
+    'masala': ['Spices', 'spice', 'mirchi', 'haldi', 'dhaniya', 'jeera', 'mustard seeds', 'rai', 'methi', 'elaichi', 'clove', 'cinnamon', 'pepper', 'garam masala'],
+    'millet': ['Millets', 'ragi', 'jowar', 'bajra', 'foxtail', 'little millet', 'barnyard millet', 'kodo millet', 'proso millet', 'siridhanya'],
+
+    # Dairy
+    'dairy': ['Dairy', 'milk', 'dudh', 'curd', 'dahi', 'yogurt', 'paneer', 'cheese', 'butter', 'makhan', 'ghee', 'cream'],
+    'milk': ['Dairy', 'dudh'],
+    'curd': ['Dairy', 'dahi', 'yogurt'],
+    'paneer': ['Dairy', 'cottage cheese'],
+
+    # Meals (Prepared Food)
+    'dinner': ['Thali', 'Veg thali', 'Non veg Thali', 'Biryani', 'Pulao', 'meal', 'bhojan'],
+    'lunch': ['Thali', 'Veg thali', 'Non veg Thali', 'Biryani', 'Pulao', 'meal', 'bhojan'],
+    'thali': ['Thali', 'Veg thali', 'Non veg Thali', 'meal', 'bhojan'],
+    'breakfast': ['Tiffins', 'nasta', 'nashta', 'morning meal'],
+    'tiffin': ['Tiffins', 'breakfast', 'nasta', 'nashta', 'morning meal', 'idli', 'dosa', 'vada', 'upma', 'poori'],
+    'starter': ['Veg starters', 'Non Veg starters', 'appetizer', 'snack', 'kebab', 'tikka', 'pakoda', 'samosa'],
+
+    # Broad/Catch-all terms
+    'food': ['Fruits', 'Vegetables', 'Dairy', 'Grains', 'Spices', 'Veg starters', 'Non Veg starters', 'Biryani', 'Pulao', 'Veg thali', 'Non veg Thali', 'Sweets', 'Snacks', 'Dry fruits', 'Tiffins', 'Desserts', 'Millets', 'Pulses', 'Flours', 'Rice', 'Oils'],
+    'item': ['Others'],
+    'other': ['Others']
+}
+
+SEARCH_BACKENDS = ('basic', 'fulltext', 'fuzzy', 'memory')
+POSTGRES_BACKENDS = ('fulltext', 'fuzzy')
+
+# Orderings accepted by ?ordering= on the product list
+PRODUCT_ORDERINGS = ('-rating_count', '-average_rating', 'price', '-price', '-created_at')
+
+# Annotation added by ranked backends; the list view orders by it when the
+# client did not ask for an explicit ordering.
+RANK_ANNOTATION = 'search_rank'
+
+# Ids read per query when loading a page of a ranked id list
+RANKED_CHUNK_SIZE = 500
+
+# Postgres-only column maintained by products/migrations/0010_product_search_vector.py
+SEARCH_VECTOR_COLUMN = 'search_vector'
+SEARCH_CONFIG = 'simple'
+
+_TOKEN_RE = re.compile(r'\w+')
+
+# One search word after expansion: ``terms`` are the lowercased word and its
+# stem (deduplicated), ``categories`` the exact Category values its synonyms
+# resolve to.
+ExpandedWord = namedtuple('ExpandedWord', ['terms', 'categories'])
+
+
+def stem(word):
+    """Basic stemming (remove trailing s)."""
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith('es') and len(word) > 3:
+        return word[:-2]
+    if word.endswith('s') and len(word) > 2:
+        return word[:-1]
+    return word
+
+
+class SynonymMatcher:
+    """Aho-Corasick automaton finding every synonym key contained in a word.
+
+    Replaces the per-request ``key in word`` scan over all keys: one pass over
+    the word finds all matching keys regardless of how many keys there are.
+    """
+
+    def __init__(self, keys):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for key in keys:
+            state = 0
+            for char in key:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._out[state] += (key,)
+
+        # Breadth-first pass wiring failure links and merging outputs;
+        # depth-1 states keep failing to the root.
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] += self._out[self._fail[child]]
+
+    def find(self, text):
+        """Set of keys occurring anywhere in ``text``."""
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            found.update(self._out[state])
+        return found
+
+
+def _resolve_categories(entries):
+    """Exact Category values matched by ``category__icontains`` on any entry.
+
+    Free-text entries such as 'mithai' match no category and drop out, and
+    overlapping entries ('Thali', 'Veg thali') collapse into one set.
+    """
+    values = [value for value, _ in Product.CATEGORY_CHOICES]
+    return frozenset(
+        value for value in values
+        if any(entry.lower() in value.lower() for entry in entries)
+    )
+
+
+# Compiled once at import
+_SYNONYM_CATEGORIES = {key: _resolve_categories(cats) for key, cats in SEARCH_SYNONYMS.items()}
+_SYNONYM_MATCHER = SynonymMatcher(SEARCH_SYNONYMS)
+
+
+@lru_cache(maxsize=4096)
+def expand_word(word):
+    """Expand one search word into its terms and synonym categories."""
+    word_lower = word.lower()
+    stemmed_word = stem(word_lower)
+    terms = (word_lower,) if stemmed_word == word_lower else (word_lower, stemmed_word)
+
+    keys = _SYNONYM_MATCHER.find(word_lower) | _SYNONYM_MATCHER.find(stemmed_word)
+    categories = frozenset().union(*(_SYNONYM_CATEGORIES[key] for key in keys))
+    return ExpandedWord(terms, categories)
+
+
+def expand_query(search_query):
+    """Expand a raw ``?search=`` value, dropping repeated words."""
+    expanded = []
+    for word in search_query.split():
+        expansion = expand_word(word.lower())
+        if expansion not in expanded:
+            expanded.append(expansion)
+    return expanded
+
+
+@lru_cache(maxsize=None)
+def has_trigram_extension():
+    """Whether pg_trgm is installed; products/migrations/0011 skips it where it is unavailable."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def get_search_backend(mode=None):
+    """Requested (or configured) backend, falling back to ``basic`` off Postgres or without pg_trgm."""
+    backend = mode if mode in SEARCH_BACKENDS else getattr(settings, 'PRODUCT_SEARCH_BACKEND', 'basic')
+    if backend not in SEARCH_BACKENDS:
+        backend = 'basic'
+    if backend in POSTGRES_BACKENDS and connection.vendor != 'postgresql':
+        backend = 'basic'
+    if backend == 'fuzzy' and not has_trigram_extension():
+        backend = 'basic'
+    return backend
+
+
+def search_products(queryset, search_query, mode=None):
+    """Narrow ``queryset`` to products matching every word of ``search_query``."""
+    words = expand_query(search_query)
+    if not words:
+        return queryset
+    backend = get_search_backend(mode)
+    if backend == 'fulltext':
+        return _fulltext_search(queryset, words)
+    if backend == 'fuzzy':
+        return _fuzzy_search(queryset, words)
+    if backend == 'memory':
+        return _memory_search(queryset, words)
+    return _basic_search(queryset, words)
+
+
+@contextmanager
+def search_transaction(backend):
+    """Evaluate ``search_products`` querysets of ``backend`` inside this block.
+
+    The fuzzy backend's cutoff is set for this transaction only
+    (``set_config(..., true)``), so it never leaks into the rest of a
+    persistent connection's session.
+    """
+    if backend != 'fuzzy':
+        yield
+        return
+    threshold = getattr(settings, 'PRODUCT_SEARCH_TRIGRAM_THRESHOLD', 0.4)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", [str(threshold)])
+        yield
+
+
+def is_ranked(queryset):
+    return RANK_ANNOTATION in queryset.query.annotations
+
+
+def order_products(queryset, ordering=None):
+    """Apply ``?ordering=``; without one, best matches (if ranked) or newest first."""
+    # id breaks ties, matching the keyset pagination key (shaaka_backend/pagination.py)
+    if ordering in PRODUCT_ORDERINGS:
+        return queryset.order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+    if is_ranked(queryset):
+        return queryset.order_by('-' + RANK_ANNOTATION, '-created_at', '-id')
+    return queryset.order_by('-created_at', '-id')
+
+
+def ranked_rows(queryset, product_ids, start=0, count=None):
+    """``(position, row)`` for the rows of ``queryset`` among ``product_ids[start:]``, in list order.
+
+    Only the ids needed are read: a chunk at a time with ``pk__in``, ordered
+    in Python, until ``count`` rows are found (all of them when ``count`` is
+    None). Ids that ``queryset`` filters out are skipped, and chunks grow
+    while that happens. Rows are model instances or ``values()`` dicts.
+    """
+    found, position = [], start
+    size = min(count or RANKED_CHUNK_SIZE, RANKED_CHUNK_SIZE)
+    while position < len(product_ids) and (count is None or len(found) < count):
+        chunk = product_ids[position:position + size]
+        rows = {row['id'] if isinstance(row, dict) else row.pk: row for row in queryset.filter(pk__in=chunk)}
+        found += [(position + offset, rows[pk]) for offset, pk in enumerate(chunk) if pk in rows]
+        position += len(chunk)
+        size = min(size * 2, RANKED_CHUNK_SIZE)
+    return found[:count]
+
+
+def _basic_search(queryset, words):
+    for word in words:
+        # Build query condition for this word
+        word_q = Q()
+        for term in word.terms:
+            word_q |= Q(name__icontains=term) | Q(description__icontains=term) | Q(category__icontains=term)
+        if word.categories:
+            word_q |= Q(category__in=sorted(word.categories))
+
+        queryset = queryset.filter(word_q)
+    return queryset
+
+
+def _prefix_query(text):
+    """tsquery matching every token of ``text`` as a prefix, e.g. ``basmati:* & rice:*``."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def _category_query(category):
+    """tsquery matching a category name in the ``B``-weighted lexemes, e.g. ``veg:B <-> thali:B``."""
+    tokens = _TOKEN_RE.findall(category.lower())
+    return ' <-> '.join(f'{token}:B' for token in tokens)
+
+
+def build_tsquery(words):
+    """Compile expanded search words into a ``to_tsquery`` string.
+
+    Each word becomes an OR group of its terms (as prefixes) and its synonym
+    categories; groups are ANDed together.
+    """
+    groups = []
+    for word in words:
+        alternatives = [_prefix_query(term) for term in word.terms]
+        alternatives += [_category_query(category) for category in sorted(word.categories)]
+
+        alternatives = [f'({term})' for term in dict.fromkeys(alternatives) if term]
+        if alternatives:
+            groups.append('(' + ' | '.join(alternatives) + ')')
+    return ' & '.join(groups)
+
+
+def _fulltext_search(queryset, words):
+    tsquery = build_tsquery(words)
+    if not tsquery:
+        return queryset.none()
+
+    column = '%s.%s' % (
+        connection.ops.quote_name(Product._meta.db_table),
+        connection.ops.quote_name(SEARCH_VECTOR_COLUMN),
+    )
+    matches = RawSQL(
+        f"{column} @@ to_tsquery('{SEARCH_CONFIG}', %s)", (tsquery,), output_field=BooleanField()
+    )
+    rank = RawSQL(
+        f"ts_rank_cd({column}, to_tsquery('{SEARCH_CONFIG}', %s))", (tsquery,), output_field=FloatField()
+    )
+    return queryset.filter(matches).annotate(**{RANK_ANNOTATION: rank})
+
+
+def _fuzzy_search(queryset, words):
+    """Typo-tolerant match on product names using pg_trgm word similarity.
+
+    ``name %> term`` is answered by the trigram GIN index from
+    products/migrations/0011_product_name_trigram.py; the cutoff is
+    ``pg_trgm.word_similarity_threshold``, so evaluate the queryset inside
+    ``search_transaction('fuzzy')``.
+    """
+    rank = None
+    for word in words:
+        word_q = Q()
+        for term in word.terms:
+            word_q |= Q(name__trigram_word_similar=term)
+        if word.categories:
+            word_q |= Q(category__in=sorted(word.categories))
+        queryset = queryset.filter(word_q)
+
+        similarities = [TrigramWordSimilarity(term, 'name') for term in word.terms]
+        similarity = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+        rank = similarity if rank is None else rank + similarity
+
+    return queryset.annotate(**{RANK_ANNOTATION: rank})
+
+
+def _memory_search(queryset, words):
+    """Match against the in-process index (unranked; see search_cache._search_ids for best-first ids)."""
+    product_ids = catalog_index.search(words)[:getattr(settings, 'PRODUCT_SEARCH_MAX_RESULTS', 1000)]
+    if not product_ids:
+        return queryset.none()
+    return queryset.filter(pk__in=product_ids)
@@ -0,0 +1,68 @@
+"""
+Search result cache for the product list.
+
+Stores the ordered list of matching product ids under a key built from the
+expanded query (terms + synonym categories, so "Dals" and "dal" share an
+entry), the search backend, the ordering and the catalog version. Any
+catalog change bumps the version, so old entries are never read again and
+age out through the cache's TTL / size bound. Only the best
+``PRODUCT_SEARCH_MAX_RESULTS`` ids are kept per query.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .catalog import get_catalog_version
+from .models import Product
+from .search import PRODUCT_ORDERINGS, expand_query, get_search_backend, order_products, search_products, search_transaction
+from .search_index import catalog_index
+
+SEARCH_CACHE_ALIAS = 'search'
+
+
+def normalize_query(search_query):
+    """Canonical form of the expanded query; word order does not matter."""
+    words = expand_query(search_query)
+    return '|'.join(sorted(
+        ','.join(word.terms) + ':' + ','.join(sorted(word.categories))
+        for word in words
+    ))
+
+
+def search_cache_key(search_query, backend, ordering):
+    digest = hashlib.sha1(normalize_query(search_query).encode('utf-8')).hexdigest()
+    return f'products:search:{get_catalog_version()}:{backend}:{ordering or ""}:{digest}'
+
+
+def cached_search_ids(search_query, mode=None, ordering=None):
+    """Ordered ids of the (at most ``PRODUCT_SEARCH_MAX_RESULTS``) best products matching ``search_query``."""
+    backend = get_search_backend(mode)
+    if ordering not in PRODUCT_ORDERINGS:
+        ordering = None
+
+    if not getattr(settings, 'PRODUCT_SEARCH_CACHE_ENABLED', True):
+        return _search_ids(search_query, backend, ordering)
+
+    cache = caches[SEARCH_CACHE_ALIAS]
+    key = search_cache_key(search_query, backend, ordering)
+    product_ids = cache.get(key)
+    if product_ids is None:
+        product_ids = _search_ids(search_query, backend, ordering)
+        cache.set(key, product_ids)
+    return product_ids
+
+
+def _search_ids(search_query, backend, ordering):
+    limit = getattr(settings, 'PRODUCT_SEARCH_MAX_RESULTS', 1000)
+    words = expand_query(search_query)
+    if backend == 'memory' and words:
+        # Ranked by the index itself; the database only sorts the capped ids for ?ordering=
+        product_ids = catalog_index.search(words)[:limit]
+        if ordering is None or not product_ids:
+            return product_ids
+        queryset = Product.objects.filter(pk__in=product_ids)
+    else:
+        queryset = search_products(Product.objects.all(), search_query, backend)
+    with search_transaction(backend):
+        return list(order_products(queryset, ordering).values_list('pk', flat=True)[:limit])
@@ -0,0 +1,151 @@
+"""
+In-process inverted index over the catalog for the ``memory`` search backend.
+
+Each worker holds its own index: token -> {product id: weight}, built from
+``Product`` on first use (or at worker start, see ``wsgi.py``) and kept
+current through ``CatalogMirror`` (products/catalog.py).
+"""
+import logging
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.db import DatabaseError
+
+from .catalog import CatalogMirror
+
+logger = logging.getLogger(__name__)
+
+FIELD_WEIGHTS = {'name': 3.0, 'category': 2.0, 'description': 1.0}
+
+# Score for a product matched only through a synonym category
+CATEGORY_MATCH_WEIGHT = FIELD_WEIGHTS['category']
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+class CatalogIndex(CatalogMirror):
+    fields = ('name', 'category', 'description', 'created_at')
+
+    def __init__(self):
+        super().__init__()
+        self._reset()
+
+    def _reset(self):
+        self._postings = {}            # token -> {product id: weight}
+        self._tokens = []              # sorted tokens, for prefix lookups
+        self._doc_tokens = {}          # product id -> tokens, for removal
+        self._doc_category = {}        # product id -> category
+        self._by_category = defaultdict(set)
+        self._created = {}             # product id -> created_at timestamp (tie-break)
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    def load(self, rows):
+        self._reset()
+        for product_id, values in rows:
+            self._add(product_id, values, keep_sorted=False)
+        self._tokens = sorted(self._postings)
+
+    def _add(self, product_id, values, keep_sorted=True):
+        weights = defaultdict(float)
+        for field in ('name', 'category', 'description'):
+            for token in set(tokenize(values[field])):
+                weights[token] += FIELD_WEIGHTS[field]
+
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                if keep_sorted:
+                    self._tokens.insert(bisect_left(self._tokens, token), token)
+            postings[product_id] = weight
+
+        category = values['category']
+        created_at = values['created_at']
+        self._doc_tokens[product_id] = set(weights)
+        self._doc_category[product_id] = category
+        self._by_category[category].add(product_id)
+        self._created[product_id] = created_at.timestamp() if created_at else 0.0
+
+    def upsert(self, product_id, values):
+        self.remove(product_id)
+        self._add(product_id, values)
+
+    def remove(self, product_id):
+        for token in self._doc_tokens.pop(product_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(product_id, None)
+                # Empty posting lists stay (and keep their slot in _tokens)
+                # until the next rebuild; prefix lookups skip them.
+        category = self._doc_category.pop(product_id, None)
+        if category is not None:
+            self._by_category[category].discard(product_id)
+        self._created.pop(product_id, None)
+
+    def _prefix_scores(self, prefix):
+        scores = defaultdict(float)
+        position = bisect_left(self._tokens, prefix)
+        while position < len(self._tokens) and self._tokens[position].startswith(prefix):
+            for product_id, weight in self._postings[self._tokens[position]].items():
+                scores[product_id] += weight
+            position += 1
+        return scores
+
+    def _term_scores(self, term):
+        """Products having a token starting with every part of ``term``."""
+        scores = None
+        for part in tokenize(term):
+            part_scores = self._prefix_scores(part)
+            if scores is None:
+                scores = part_scores
+            else:
+                scores = {pid: score + part_scores[pid] for pid, score in scores.items() if pid in part_scores}
+        return scores or {}
+
+    def _word_scores(self, word):
+        scores = {}
+        for term in word.terms:
+            for product_id, score in self._term_scores(term).items():
+                scores[product_id] = max(score, scores.get(product_id, 0.0))
+        for category in word.categories:
+            for product_id in self._by_category.get(category, ()):
+                scores[product_id] = scores.get(product_id, 0.0) + CATEGORY_MATCH_WEIGHT
+        return scores
+
+    def search(self, words):
+        """Product ids matching every expanded word, best match first."""
+        with self._lock:
+            self.ensure_fresh()
+            scores = None
+            for word in words:
+                word_scores = self._word_scores(word)
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = {pid: score + word_scores[pid] for pid, score in scores.items() if pid in word_scores}
+                if not scores:
+                    return []
+            return sorted(scores, key=lambda pid: (-scores[pid], -self._created[pid], -pid))
+
+
+catalog_index = CatalogIndex()
+
+
+def warm_up():
+    """Build the index at worker start when the memory backend is enabled."""
+    from .search import get_search_backend
+
+    if get_search_backend() != 'memory':
+        return
+    try:
+        catalog_index.build()
+    except DatabaseError:
+        # Not fatal: the first search builds it instead.
+        logger.exception('Could not build the catalog search index at startup')
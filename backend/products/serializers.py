@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Product, ProductImage, ProductReview, ProductVariant, AutoScrollImage
+from drf_spectacular.utils import extend_schema_field
+from .models import AVAILABLE_QUANTITY, Product, ProductImage, ProductReview, ProductVariant, AutoScrollImage
 from users.serializers import UserProfileSerializer
 
 class AutoScrollImageSerializer(serializers.ModelSerializer):
@@ -20,24 +21,46 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'user_name', 'rating', 'comment', 'created_at']
         read_only_fields = ['id', 'user', 'created_at']
 
+def available_quantity_field():
+    # stock_quantity stays the vendor's editable total; this is what customers can still buy
+    return serializers.DecimalField(max_digits=10, decimal_places=3, read_only=True)
+
+
 class ProductVariantSerializer(serializers.ModelSerializer):
+    available_quantity = available_quantity_field()
+
     class Meta:
         model = ProductVariant
-        fields = ['id', 'quantity', 'unit', 'price', 'stock_quantity']
+        fields = ['id', 'quantity', 'unit', 'price', 'stock_quantity', 'available_quantity']
+        # Computed columns for the compiled serializers (shaaka_backend/compiled_serializers.py)
+        annotations = {'available_quantity': AVAILABLE_QUANTITY}
+
+class SparseFieldsMixin:
+    """Render only the fields named in the ``fields`` context entry (all when absent)."""
 
-class ProductSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
     variants = ProductVariantSerializer(many=True, required=False)
     vendor_name = serializers.ReadOnlyField(source='vendor.full_name')
+    available_quantity = available_quantity_field()
     
     class Meta:
         model = Product
         fields = [
             'id', 'vendor', 'vendor_name', 'name', 'description', 
-            'category', 'price', 'unit', 'stock_quantity', 
+            'category', 'price', 'unit', 'stock_quantity', 'available_quantity',
             'average_rating', 'rating_count', 'images', 'variants', 'created_at'
         ]
         read_only_fields = ['id', 'vendor', 'average_rating', 'rating_count', 'created_at', 'updated_at']
+        annotations = {'available_quantity': AVAILABLE_QUANTITY}
 
     def create(self, validated_data):
         variants_data = validated_data.pop('variants', [])
@@ -66,3 +89,27 @@ class ProductSerializer(serializers.ModelSerializer):
                 ProductVariant.objects.create(product=instance, **variant_data)
                 
         return instance
+
+
+class ProductCardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Compact read-only product for grid screens (``?view=card``)."""
+
+    thumbnail = serializers.SerializerMethodField()
+    available_quantity = available_quantity_field()
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'name', 'price', 'unit', 'thumbnail', 'average_rating', 'rating_count', 'stock_quantity',
+            'available_quantity',
+        ]
+        read_only_fields = fields
+        annotations = {'available_quantity': AVAILABLE_QUANTITY}
+
+    @extend_schema_field(serializers.CharField(allow_null=True))
+    def get_thumbnail(self, obj):
+        # Annotated by Product.objects.for_serializer(); fall back to the images
+        if hasattr(obj, 'thumbnail'):
+            return obj.thumbnail
+        image = min(obj.images.all(), key=lambda image: image.id, default=None)
+        return image.image_url if image else None
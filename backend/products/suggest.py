@@ -0,0 +1,133 @@
+"""
+Prefix index for the typeahead endpoint (/api/products/suggest/?q=).
+
+Entries are kept in a sorted list and looked up with bisect. Each product
+name is indexed under its full text and under every word-suffix
+("chicken biryani", "biryani"), so a prefix matches from the start of any
+word. Category labels and the search synonym keys are static entries.
+
+The index is a ``CatalogMirror``: local product changes are applied in
+place and the shared catalog version is probed at most once every
+``PRODUCT_SUGGEST_REFRESH_SECONDS``, so lookups normally touch neither the
+database nor the cache.
+"""
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from .catalog import CatalogMirror
+from .models import Product
+from .search import SEARCH_SYNONYMS
+from .search_index import tokenize
+
+CATEGORY, KEYWORD, PRODUCT = 'category', 'keyword', 'product'
+
+# Ties between equally good matches: categories, then keywords, then products
+_KIND_ORDER = {CATEGORY: 0, KEYWORD: 1, PRODUCT: 2}
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+
+# Upper bound on entries looked at for one lookup (one-letter prefixes)
+MAX_SCAN = 2000
+
+
+def normalize(text):
+    return ' '.join(tokenize(text))
+
+
+def _keys(text):
+    """(key, is_full) pairs: the full normalized text and each word-suffix."""
+    words = tokenize(text)
+    return [(' '.join(words[i:]), i == 0) for i in range(len(words))]
+
+
+class SuggestionIndex(CatalogMirror):
+    fields = ('name',)
+
+    def __init__(self):
+        super().__init__()
+        self.refresh_interval = getattr(settings, 'PRODUCT_SUGGEST_REFRESH_SECONDS', 5)
+        self._reset()
+
+    def _reset(self):
+        self._entries = []       # sorted (key, is_full, kind, text)
+        self._refcounts = {}     # entry -> number of sources (products sharing a name)
+        self._names = {}         # product id -> name, for removal
+
+    def _add_text(self, text, kind, keep_sorted=True):
+        for key, is_full in _keys(text):
+            entry = (key, is_full, kind, text)
+            count = self._refcounts.get(entry, 0)
+            self._refcounts[entry] = count + 1
+            if count == 0:
+                if keep_sorted:
+                    insort(self._entries, entry)
+                else:
+                    self._entries.append(entry)
+
+    def _remove_text(self, text, kind):
+        for key, is_full in _keys(text):
+            entry = (key, is_full, kind, text)
+            count = self._refcounts.pop(entry, 0)
+            if count > 1:
+                self._refcounts[entry] = count - 1
+            elif count == 1:
+                position = bisect_left(self._entries, entry)
+                del self._entries[position]
+
+    def load(self, rows):
+        self._reset()
+        for value, label in Product.CATEGORY_CHOICES:
+            self._add_text(label, CATEGORY, keep_sorted=False)
+        for keyword in SEARCH_SYNONYMS:
+            self._add_text(keyword, KEYWORD, keep_sorted=False)
+        for product_id, values in rows:
+            self._names[product_id] = values['name']
+            self._add_text(values['name'], PRODUCT, keep_sorted=False)
+        self._entries.sort()
+
+    def upsert(self, product_id, values):
+        self.remove(product_id)
+        self._names[product_id] = values['name']
+        self._add_text(values['name'], PRODUCT)
+
+    def remove(self, product_id):
+        name = self._names.pop(product_id, None)
+        if name is not None:
+            self._remove_text(name, PRODUCT)
+
+    def _matches(self, prefix):
+        position = bisect_left(self._entries, (prefix,))
+        end = min(position + MAX_SCAN, len(self._entries))
+        while position < end:
+            entry = self._entries[position]
+            if not entry[0].startswith(prefix):
+                break
+            yield entry
+            position += 1
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """Up to ``limit`` (text, kind) pairs for the prefix ``query``."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self._lock:
+            self.ensure_fresh()
+            ranked = sorted(
+                self._matches(prefix),
+                key=lambda entry: (not entry[1], _KIND_ORDER[entry[2]], len(entry[3]), entry[3].lower()),
+            )
+
+        suggestions, seen = [], set()
+        for key, is_full, kind, text in ranked:
+            if text.lower() in seen:
+                continue
+            seen.add(text.lower())
+            suggestions.append((text, kind))
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+
+suggestion_index = SuggestionIndex()
@@ -1,3 +1,634 @@
-from django.test import TestCase
+import json
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import renderers
+from rest_framework.test import APIClient
+
+from shaaka_backend.renderers import msgspec
+from users.models import UserProfile
+from .models import AutoScrollImage, Product, ProductVariant, WishlistItem
+from .banners import banner_feed
+from .catalog import catalog_changed, get_catalog_version, get_mirror_version, warn_if_process_local
+from .search import SynonymMatcher, build_tsquery, expand_query, expand_word, has_trigram_extension, search_products
+from .search_cache import cached_search_ids
+from .search_index import catalog_index
+from .suggest import suggestion_index
+
+
+class ProductSearchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = UserProfile.objects.create(
+            full_name='Test Vendor', mobile_number='9000000001', password_hash='x', category='Vendor'
+        )
+        for name, description, category in [
+            ('Chicken Biryani', 'Hyderabadi dum biryani', 'Biryani'),
+            ('Paneer Tikka', 'Grilled cottage cheese', 'Veg starters'),
+            ('Toor Dal', 'Split pigeon peas', 'Pulses'),
+            ('Basmati Rice', 'Long grain rice', 'Rice'),
+            ('Jowar Flour', 'Sorghum atta', 'Flours'),
+        ]:
+            Product.objects.create(
+                vendor=cls.vendor, name=name, description=description, category=category,
+                price=100, unit='kg', stock_quantity=10,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['search'].clear()
+        banner_feed.clear()
+
+    def search(self, query, **params):
+        response = self.client.get('/api/products/', {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [product['name'] for product in response.data]
+
+
+class ProductSearchTests(ProductSearchTestCase):
+    """Search behaviour every database backend keeps (full-text only runs on Postgres)."""
+
+    def backends(self):
+        return ('basic', 'fulltext') if connection.vendor == 'postgresql' else ('basic',)
+
+    def assertSearch(self, query, expected):
+        for backend in self.backends():
+            with self.subTest(backend=backend):
+                self.assertCountEqual(self.search(query, search_mode=backend), expected)
+
+    def test_matches_name_description_and_category(self):
+        self.assertSearch('tikka', ['Paneer Tikka'])
+        self.assertSearch('sorghum', ['Jowar Flour'])
+        self.assertSearch('pulses', ['Toor Dal'])
+
+    def test_stemming(self):
+        self.assertSearch('biryanis', ['Chicken Biryani'])
+
+    def test_category_synonyms(self):
+        self.assertSearch('grocery', ['Toor Dal', 'Basmati Rice', 'Jowar Flour'])
+
+    def test_fuzzy_without_pg_trgm_is_basic(self):
+        with mock.patch('products.search.has_trigram_extension', return_value=False):
+            self.assertEqual(self.search('tikka', search_mode='fuzzy'), ['Paneer Tikka'])
+
+    def test_every_word_must_match(self):
+        self.assertSearch('chicken biryani', ['Chicken Biryani'])
+        self.assertSearch('chicken rice', [])
+
+    def test_build_tsquery(self):
+        self.assertEqual(build_tsquery(expand_query('basmati')), '((basmati:*))')
+        # Word and stem as prefixes, synonym categories as B-weighted phrases
+        self.assertEqual(build_tsquery(expand_query('dals')), '((dals:*) | (dal:*) | (pulses:B))')
+        self.assertEqual(build_tsquery(expand_query('rice atta')), '((rice:*) | (rice:B)) & ((atta:*) | (flours:B))')
+
+
+class SearchExpansionTests(TestCase):
+    def test_matcher_finds_every_contained_key(self):
+        matcher = SynonymMatcher(['veg', 'nonveg', 'dry fruit', 'fruit'])
+        self.assertEqual(matcher.find('nonvegetarian'), {'nonveg', 'veg'})
+        self.assertEqual(matcher.find('dry fruits'), {'dry fruit', 'fruit'})
+        self.assertEqual(matcher.find('rice'), set())
+
+    def test_word_terms_and_categories(self):
+        self.assertEqual(expand_word('dals'), (('dals', 'dal'), {'Pulses'}))
+        self.assertEqual(expand_word('rice'), (('rice',), {'Rice'}))
+
+    def test_expansion_deduplicates_categories(self):
+        words = expand_query('chicken chicken')
+        self.assertEqual(len(words), 1)
+        self.assertEqual(words[0].categories, {'Non Veg starters', 'Non veg Thali', 'Biryani'})
+
+    def test_basic_search_has_one_category_clause_per_word(self):
+        sql = str(search_products(Product.objects.all(), 'chicken biryani', 'basic').query)
+        self.assertEqual(sql.count('"category" IN'), 1)
+        self.assertEqual(sql.count('Non Veg starters'), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Full-text search needs PostgreSQL')
+class FullTextSearchTests(ProductSearchTestCase):
+    def test_name_matches_rank_first(self):
+        Product.objects.create(
+            vendor=self.vendor, name='Idli Batter', description='Made with basmati rice', category='Tiffins',
+            price=60, unit='kg', stock_quantity=5,
+        )
+        self.assertEqual(self.search('basmati', search_mode='fulltext'), ['Basmati Rice', 'Idli Batter'])
+
+    def test_vector_follows_updates(self):
+        Product.objects.filter(name='Toor Dal').update(name='Arhar Dal')
+        self.assertEqual(self.search('arhar', search_mode='fulltext'), ['Arhar Dal'])
+        self.assertEqual(self.search('toor', search_mode='fulltext'), [])
+
+
+class SearchCacheTests(ProductSearchTestCase):
+    def test_repeated_search_is_served_from_cache(self):
+        first = self.search('groceries')
+        with mock.patch('products.search_cache._search_ids') as run_search:
+            # Same expanded query, invalid ordering falls back to the default
+            self.assertEqual(self.search('Groceries', ordering='nonsense'), first)
+        run_search.assert_not_called()
+
+    def test_catalog_change_invalidates(self):
+        self.assertEqual(self.search('dal'), ['Toor Dal'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(
+                vendor=self.vendor, name='Moong Dal', description='Yellow lentils', category='Pulses',
+                price=80, unit='kg', stock_quantity=5,
+            )
+        self.assertEqual(self.search('dal'), ['Moong Dal', 'Toor Dal'])
+
+    def test_results_are_capped(self):
+        catalog_index.build()
+        with self.settings(PRODUCT_SEARCH_MAX_RESULTS=2):
+            for backend in ('basic', 'memory'):
+                with self.subTest(backend=backend):
+                    self.assertEqual(len(self.search('grocery', search_mode=backend)), 2)
+
+
+class MemorySearchTests(ProductSearchTestCase):
+    def setUp(self):
+        super().setUp()
+        catalog_index.build()
+
+    def test_matches_like_basic_search(self):
+        self.assertCountEqual(self.search('grocery', search_mode='memory'), self.search('grocery', search_mode='basic'))
+        self.assertEqual(self.search('chicken biryani', search_mode='memory'), ['Chicken Biryani'])
+
+    def test_name_matches_rank_first(self):
+        Product.objects.create(
+            vendor=self.vendor, name='Rice Flour', description='Fine flour', category='Flours',
+            price=50, unit='kg', stock_quantity=5,
+        )
+        catalog_index.build()
+        self.assertEqual(self.search('flour', search_mode='memory'), ['Rice Flour', 'Jowar Flour'])
+
+    def test_explicit_ordering(self):
+        Product.objects.filter(name='Jowar Flour').update(price=40)
+        self.assertEqual(
+            self.search('grocery', search_mode='memory', ordering='price'), ['Jowar Flour', 'Toor Dal', 'Basmati Rice']
+        )
+
+    def test_follows_product_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                vendor=self.vendor, name='Moong Dal', description='Yellow lentils', category='Pulses',
+                price=80, unit='kg', stock_quantity=5,
+            )
+        self.assertCountEqual(self.search('dal', search_mode='memory'), ['Toor Dal', 'Moong Dal'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(self.search('dal', search_mode='memory'), ['Toor Dal'])
+
+    def test_warns_about_process_local_versions(self):
+        with self.settings(DEBUG=False), self.assertLogs('products.catalog', 'WARNING'):
+            warn_if_process_local()
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}
+        with self.settings(DEBUG=False, CACHES=shared), self.assertNoLogs('products.catalog', 'WARNING'):
+            warn_if_process_local()
+
+    def test_only_text_changes_rebuild_mirrors(self):
+        product = Product.objects.get(name='Toor Dal')
+        mirror_version, catalog_version = get_mirror_version(), get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            product.stock_quantity = 3
+            product.save()
+            product.variants.create(quantity=1, unit='kg', price=90)
+            catalog_changed()
+        self.assertEqual(get_mirror_version(), mirror_version)
+        self.assertEqual(get_catalog_version(), catalog_version + 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Arhar Dal'
+            product.save()
+        self.assertEqual(get_mirror_version(), mirror_version + 1)
+        # Applied in place: the index follows the shared version without a rebuild
+        self.assertEqual(catalog_index.version, mirror_version + 1)
+        self.assertEqual(self.search('arhar', search_mode='memory'), ['Arhar Dal'])
+
+
+class ProductSuggestTests(ProductSearchTestCase):
+    def setUp(self):
+        super().setUp()
+        suggestion_index.build()
+
+    def suggest(self, query, **params):
+        response = self.client.get('/api/products/suggest/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(item['text'], item['type']) for item in response.data['suggestions']]
+
+    def test_prefix_of_any_word(self):
+        # The 'biryani' synonym key is folded into the category of the same name
+        self.assertEqual(self.suggest('bir'), [('Biryani', 'category'), ('Chicken Biryani', 'product')])
+        self.assertEqual(self.suggest('chicken b'), [('Chicken Biryani', 'product')])
+
+    def test_no_queries_on_hot_path(self):
+        self.suggest('rice')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('basm'), [('Basmati Rice', 'product')])
+
+    def test_limit_and_empty_query(self):
+        self.assertEqual(len(self.suggest('s', limit=2)), 2)
+        self.assertEqual(self.suggest('  '), [])
+
+    def test_follows_product_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                vendor=self.vendor, name='Moong Dal', description='Yellow lentils', category='Pulses',
+                price=80, unit='kg', stock_quantity=5,
+            )
+        self.assertIn(('Moong Dal', 'product'), self.suggest('moo'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Green Moong'
+            product.save()
+        self.assertEqual(self.suggest('moong d'), [])
+        self.assertIn(('Green Moong', 'product'), self.suggest('moo'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertNotIn(('Green Moong', 'product'), self.suggest('moo'))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Trigram search needs PostgreSQL')
+class FuzzySearchTests(ProductSearchTestCase):
+    def setUp(self):
+        super().setUp()
+        if not has_trigram_extension():
+            self.skipTest('pg_trgm extension is not installed')
+
+    def test_tolerates_typos(self):
+        self.assertEqual(self.search('biriyani', search_mode='fuzzy')[:1], ['Chicken Biryani'])
+        self.assertEqual(self.search('panner', search_mode='fuzzy')[:1], ['Paneer Tikka'])
+        self.assertEqual(self.search('jowaar', search_mode='fuzzy')[:1], ['Jowar Flour'])
+
+    def test_unrelated_query_matches_nothing(self):
+        self.assertEqual(self.search('xylophone', search_mode='fuzzy'), [])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Trigram search needs PostgreSQL')
+class FuzzySearchSessionTests(TransactionTestCase):
+    def test_threshold_does_not_outlive_the_search(self):
+        if not has_trigram_extension():
+            self.skipTest('pg_trgm extension is not installed')
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW pg_trgm.word_similarity_threshold')
+            default = cursor.fetchone()[0]
+        caches['search'].clear()
+        self.assertEqual(cached_search_ids('biriyani', mode='fuzzy'), [])
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW pg_trgm.word_similarity_threshold')
+            self.assertEqual(cursor.fetchone()[0], default)
+
+
+class CatalogBenchmarkCommandTests(TestCase):
+    def generate(self, **options):
+        call_command('generate_catalog', products=30, customers=10, seed=7, stdout=StringIO(), **options)
+        return list(Product.objects.order_by('id').values_list('name', 'category', 'price'))
+
+    def test_generated_catalog_is_reproducible(self):
+        first = self.generate()
+        self.assertEqual(len(first), 30)
+        self.assertTrue(ProductVariant.objects.exists())
+        self.assertEqual(self.generate(clear=True), first)
+
+    def test_benchmark_writes_json(self):
+        self.generate()
+        with tempfile.NamedTemporaryFile(mode='r', suffix='.json') as output:
+            call_command('benchmark_catalog', repeat=2, only='detail,vendor', output=output.name, stderr=StringIO())
+            report = json.load(output)
+        self.assertEqual([scenario['name'] for scenario in report['scenarios']], ['detail', 'vendor', 'vendor_page'])
+        detail = report['scenarios'][0]
+        self.assertEqual(detail['view'], 'ProductDetailView')
+        self.assertGreater(detail['queries'], 0)
+        self.assertTrue(detail['plans'])
+
+    def test_serialization_benchmark_checks_output(self):
+        self.generate()
+        stdout = StringIO()
+        call_command('benchmark_serialization', products=30, repeat=1, stdout=stdout)
+        self.assertIn('compiled', stdout.getvalue())
+
+    @skipUnless(msgspec, 'msgspec is not installed')
+    def test_renderer_benchmark(self):
+        self.generate()
+        stdout = StringIO()
+        call_command('benchmark_renderers', products=30, repeat=1, stdout=stdout)
+        self.assertIn('msgpack', stdout.getvalue())
+
+
+class KeysetPaginationTests(ProductSearchTestCase):
+    def walk(self, path, **params):
+        names, response = [], self.client.get(path, {'limit': 2, **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            names += [product['name'] for product in response.data['results']]
+            if not response.data['next']:
+                return names
+            response = self.client.get(response.data['next'])
+
+    def test_pages_cover_the_unpaginated_list(self):
+        # Equal prices: the id tie-breaker must neither skip nor repeat rows
+        for ordering in ('-created_at', 'price', '-rating_count'):
+            full = [product['name'] for product in self.client.get('/api/products/', {'ordering': ordering}).data]
+            self.assertEqual(self.walk('/api/products/', ordering=ordering), full)
+
+    def test_search_results(self):
+        self.assertEqual(self.walk('/api/products/', search='grocery'), self.search('grocery'))
+
+    def test_search_page_loads_only_its_products(self):
+        def page_queries(mode):
+            caches['search'].clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(
+                    '/api/products/', {'search': 'rice', 'search_mode': mode, 'limit': 2, 'view': 'card'}
+                )
+            self.assertEqual(len(response.data['results']), 2)
+            # Commas count the ids listed in each query
+            return [query['sql'].count(',') for query in queries]
+
+        def add_rice(count):
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(count):
+                    Product.objects.create(
+                        vendor=self.vendor, name=f'Rice {i}', description='', category='Rice', price=100, unit='kg',
+                    )
+
+        add_rice(2)
+        catalog_index.build()
+        few = {mode: page_queries(mode) for mode in ('basic', 'memory')}
+        add_rice(40)
+        for mode in few:
+            with self.subTest(mode=mode):
+                # Same queries, each naming as many ids as before
+                self.assertEqual(page_queries(mode), few[mode])
+
+    def test_search_results_are_capped(self):
+        with self.settings(PRODUCT_SEARCH_MAX_RESULTS=2):
+            self.assertEqual(len(self.walk('/api/products/', search='grocery')), 2)
+            self.assertEqual(len(self.search('grocery')), 2)
+
+    def test_vendor_products(self):
+        self.assertEqual(len(self.walk(f'/api/products/vendor/{self.vendor.id}/')), 5)
+
+    def test_unpaginated_without_params(self):
+        self.assertIsInstance(self.client.get('/api/products/').data, list)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/products/', {'cursor': 'garbage'}).status_code, 404)
+        self.assertEqual(self.client.get('/api/products/', {'cursor': 'WyJ4IiwgMV0'}).status_code, 404)
+
+
+class ProductFilterTests(ProductSearchTestCase):
+    def names(self, **params):
+        response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(product['name'] for product in response.data)
+
+    def test_category_is_exact_and_repeatable(self):
+        self.assertEqual(self.names(category='Rice'), ['Basmati Rice'])
+        self.assertEqual(self.names(category=['Rice', 'Pulses']), ['Basmati Rice', 'Toor Dal'])
+        self.assertEqual(self.names(category='Rice,Flours'), ['Basmati Rice', 'Jowar Flour'])
+        self.assertEqual(self.names(category='ric'), [])
+
+    def test_price_rating_stock_and_vendor(self):
+        Product.objects.filter(name='Toor Dal').update(price=40, stock_quantity=0, average_rating='4.50')
+        self.assertEqual(self.names(max_price='50'), ['Toor Dal'])
+        self.assertEqual(len(self.names(min_price='50.00')), 4)
+        self.assertEqual(self.names(min_rating='4'), ['Toor Dal'])
+        self.assertEqual(self.names(in_stock='false'), ['Toor Dal'])
+        self.assertEqual(len(self.names(in_stock='true', vendor=self.vendor.id)), 4)
+
+    def test_stock_held_by_carts_is_not_in_stock(self):
+        Product.objects.filter(name='Paneer Tikka').update(reserved_quantity=10)
+        self.assertNotIn('Paneer Tikka', self.names(in_stock='true'))
+        self.assertEqual(self.names(in_stock='false'), ['Paneer Tikka'])
+        product = self.client.get('/api/products/', {'search': 'paneer'}).data[0]
+        self.assertEqual((product['stock_quantity'], product['available_quantity']), ('10.000', '0.000'))
+
+    def test_combines_with_search(self):
+        self.assertEqual(self.names(search='grocery', category='Flours'), ['Jowar Flour'])
+
+    def test_invalid_values(self):
+        for params in ({'min_price': 'cheap'}, {'vendor': 'x'}, {'in_stock': 'maybe'}, {'min_rating': 'NaN'}):
+            self.assertEqual(self.client.get('/api/products/', params).status_code, 400)
+
+
+class ProductQueryCountTests(ProductSearchTestCase):
+    """Product endpoints run a fixed number of queries however many products they return."""
+
+    def add_products(self, count):
+        for i in range(count):
+            product = Product.objects.create(
+                vendor=self.vendor, name=f'Extra {i}', description='Extra', category='Others',
+                price=10, unit='kg', stock_quantity=1,
+            )
+            product.images.create(image_url=f'https://img.example.com/{i}.jpg')
+            product.variants.create(quantity=1, unit='kg', price=10)
+
+    def assertConstantQueries(self, path, expected, params=None):
+        for extra in (0, 10):
+            self.add_products(extra)
+            with self.assertNumQueries(expected):
+                self.assertEqual(self.client.get(path, params).status_code, 200)
+
+    def test_product_list(self):
+        # products + vendor, images, variants
+        self.assertConstantQueries('/api/products/', 3)
+        self.assertConstantQueries('/api/products/', 3, {'limit': 50})
+
+    def test_vendor_products(self):
+        self.assertConstantQueries(f'/api/products/vendor/{self.vendor.id}/', 3)
+
+    def test_wishlist(self):
+        customer = UserProfile.objects.create(
+            full_name='Customer', mobile_number='9000000002', password_hash='x', category='Customer'
+        )
+        for extra in (0, 10):
+            self.add_products(extra)
+            for product in Product.objects.exclude(wishlisted_by__user=customer):
+                WishlistItem.objects.create(user=customer, product=product)
+            with self.assertNumQueries(3):
+                response = self.client.get(f'/api/wishlist/{customer.id}/')
+            self.assertEqual(len(response.data), 5 + extra)
+
+    def test_product_detail(self):
+        product = Product.objects.first()
+        with self.assertNumQueries(3):
+            self.client.get(f'/api/products/{product.id}/')
+
+
+class ProductRepresentationTests(ProductSearchTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        product = Product.objects.get(name='Toor Dal')
+        product.images.create(image_url='https://img.example.com/dal-1.jpg')
+        product.images.create(image_url='https://img.example.com/dal-2.jpg')
+        cls.product = product
+
+    def test_card_view(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/', {'view': 'card', 'category': 'Pulses'})
+        self.assertEqual(response.data, [{
+            'id': self.product.id, 'name': 'Toor Dal', 'price': '100.00', 'unit': 'kg',
+            'thumbnail': 'https://img.example.com/dal-1.jpg', 'average_rating': '0.00',
+            'rating_count': 0, 'stock_quantity': '10.000', 'available_quantity': '10.000',
+        }])
+        detail = self.client.get(f'/api/products/{self.product.id}/', {'view': 'card'}).data
+        self.assertEqual(detail['thumbnail'], 'https://img.example.com/dal-1.jpg')
+
+    def test_sparse_fields(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/', {'fields': 'id,name,vendor_name', 'category': 'Pulses'})
+        self.assertEqual(response.data, [{'id': self.product.id, 'name': 'Toor Dal', 'vendor_name': 'Test Vendor'}])
+
+        response = self.client.get(f'/api/products/vendor/{self.vendor.id}/', {'fields': 'name,images', 'limit': 1})
+        self.assertEqual(list(response.data['results'][0]), ['name', 'images'])
+
+    def test_unknown_field(self):
+        self.assertEqual(self.client.get('/api/products/', {'fields': 'name,secret'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/products/', {'view': 'card', 'fields': 'description'}).status_code, 400)
+
+
+class CompiledSerializerTests(ProductSearchTestCase):
+    """The values() fast path renders the same bytes as the DRF serializers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for product in Product.objects.all():
+            product.images.create(image_url=f'https://img.example.com/{product.id}-b.jpg')
+            product.images.create(image_url=f'https://img.example.com/{product.id}-a.jpg')
+            product.variants.create(quantity='0.5', unit='kg', price='55.5', stock_quantity=3)
+        cls.customer = UserProfile.objects.create(
+            full_name='Customer', mobile_number='9000000002', password_hash='x', category='Customer'
+        )
+        for product in Product.objects.order_by('id')[:3]:
+            WishlistItem.objects.create(user=cls.customer, product=product)
+
+    def assertSameContent(self, path, **params):
+        pages = []
+        for enabled in (True, False):
+            with self.settings(FAST_SERIALIZATION_ENABLED=enabled):
+                response = self.client.get(path, params)
+                contents = [response.content]
+                while response.status_code == 200 and isinstance(response.data, dict) and response.data.get('next'):
+                    response = self.client.get(response.data['next'])
+                    contents.append(response.content)
+            self.assertEqual(response.status_code, 200)
+            pages.append(contents)
+        self.assertEqual(pages[0], pages[1])
+
+    def test_product_lists(self):
+        self.assertSameContent('/api/products/')
+        self.assertSameContent('/api/products/', ordering='price', limit=2)
+        self.assertSameContent('/api/products/', search='rice')
+        self.assertSameContent('/api/products/', view='card', limit=2)
+        self.assertSameContent('/api/products/', fields='name,vendor_name,variants', ordering='-rating_count', limit=2)
+        self.assertSameContent(f'/api/products/vendor/{self.vendor.id}/', limit=3)
+        self.assertSameContent(f'/api/wishlist/{self.customer.id}/', limit=2)
+
+
+@skipUnless(msgspec, 'msgspec is not installed')
+class RendererTests(ProductSearchTestCase):
+    def test_json_matches_stdlib_renderer(self):
+        Product.objects.filter(name='Toor Dal').update(description='Split\u2028pigeon peas, ₹ per kg')
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.content, renderers.JSONRenderer().render(response.data))
+        self.assertIn(b'\\u2028', response.content)
+
+    def test_msgpack(self):
+        response = self.client.get('/api/products/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgspec.msgpack.decode(response.content), json.loads(self.client.get('/api/products/').content))
+
+        customer = UserProfile.objects.create(
+            full_name='Customer', mobile_number='9000000002', password_hash='x', category='Customer'
+        )
+        product = Product.objects.first()
+        response = self.client.post(
+            f'/api/wishlist/toggle/{customer.id}/', msgspec.msgpack.encode({'product_id': product.id}),
+            content_type='application/msgpack',
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_invalid_json(self):
+        customer_id = self.vendor.id
+        response = self.client.post(f'/api/wishlist/toggle/{customer_id}/', '{"product_id":', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(ProductSearchTestCase):
+    def test_product_list_not_modified(self):
+        response = self.client.get('/api/products/', {'view': 'card'})
+        etag = response['ETag']
+        self.assertIn('must-revalidate', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/', {'view': 'card'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.client.get('/api/products/', {'view': 'card', 'limit': 2})['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(name='Toor Dal').images.create(image_url='https://img.example.com/dal.jpg')
+        response = self.client.get('/api/products/', {'view': 'card'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_and_errors(self):
+        product = Product.objects.first()
+        etag = self.client.get(f'/api/products/{product.id}/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            UserProfile.objects.filter(pk=self.vendor.pk).get().save()
+        self.assertNotEqual(self.client.get(f'/api/products/{product.id}/')['ETag'], etag)
+        self.assertFalse(self.client.get('/api/products/0/').has_header('ETag'))
+
+    def test_banners(self):
+        AutoScrollImage.objects.create(title='Sale', is_active=True, placement='home', image_url='https://img.example.com/b.jpg')
+        response = self.client.get('/api/products/auto-scroll-images/')
+        self.assertEqual(len(response.data), 1)
+        response = self.client.get(
+            '/api/products/auto-scroll-images/',
+            HTTP_IF_NONE_MATCH=response['ETag'], HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_gzip(self):
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/'))
+
+
+class BannerFeedTests(ProductSearchTestCase):
+    def setUp(self):
+        super().setUp()
+        AutoScrollImage.objects.create(title='Home 2', is_active=True, order=2, placement='home')
+        AutoScrollImage.objects.create(title='Home 1', is_active=True, order=1, placement='home')
+        AutoScrollImage.objects.create(title='Offers', is_active=True, order=1, placement='offers')
+        AutoScrollImage.objects.create(title='Hidden', is_active=False, order=0, placement='home')
+
+    def titles(self, **params):
+        return [banner['title'] for banner in self.client.get('/api/products/auto-scroll-images/', params).data]
+
+    def test_placement_filter(self):
+        self.assertEqual(self.titles(), ['Home 1', 'Offers', 'Home 2'])
+        self.assertEqual(self.titles(placement='home'), ['Home 1', 'Home 2'])
+        self.assertEqual(self.titles(placement='nowhere'), [])
+
+    def test_served_from_memory_until_probe(self):
+        self.titles()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles(placement='offers'), ['Offers'])
+
+        AutoScrollImage.objects.filter(title='Offers').delete()
+        banner_feed._checked_at = float('-inf')  # TTL expired
+        with self.assertNumQueries(2):  # probe, reload
+            self.assertEqual(self.titles(placement='offers'), [])
+        banner_feed._checked_at = float('-inf')
+        with self.assertNumQueries(1):  # probe only
+            self.titles()
@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (
     ProductListCreateView, 
+    ProductSuggestView,
     VendorProductListView, 
     ProductDetailView,
     ProductReviewListCreateView,
@@ -13,6 +14,7 @@ from .views import (
 
 urlpatterns = [
     path('products/', ProductListCreateView.as_view(), name='product-list-create'),
+    path('products/suggest/', ProductSuggestView.as_view(), name='product-suggest'),
     path('products/auto-scroll-images/', AutoScrollImageListView.as_view(), name='auto-scroll-image-list'),
     path('products/<int:pk>/', ProductDetailView.as_view(), name='product-detail'),
     path('products/vendor/<int:vendor_id>/', VendorProductListView.as_view(), name='vendor-product-list'),
@@ -1,123 +1,110 @@
+from functools import partial
+
 from rest_framework import generics, status, permissions, serializers
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
+from django.db.models import F
 from django.shortcuts import get_object_or_404
-from .models import Product, ProductImage, ProductReview, AutoScrollImage, WishlistItem
-from .serializers import ProductSerializer, ProductReviewSerializer, AutoScrollImageSerializer
+from .models import Product, ProductImage, ProductReview, WishlistItem
+from .serializers import ProductSerializer, ProductCardSerializer, ProductReviewSerializer, AutoScrollImageSerializer
+from .banners import banner_feed
+from .conditional import banner_etag, banner_last_modified, catalog_etag, conditional_get
+from .filters import filter_products
+from .search import order_products, ranked_rows
+from .search_cache import cached_search_ids
+from .suggest import DEFAULT_LIMIT, MAX_LIMIT, suggestion_index
 from users.models import UserProfile
+from shaaka_backend.compiled_serializers import NotCompilable, compile_serializer
+
+class ProductRepresentationMixin:
+    """``?view=card`` (compact grid cards) and ``?fields=a,b`` (sparse fields) on GET requests."""
+
+    def is_card_view(self):
+        return self.request.method == 'GET' and self.request.query_params.get('view') == 'card'
+
+    def get_serializer_class(self):
+        return ProductCardSerializer if self.is_card_view() else super().get_serializer_class()
+
+    def requested_fields(self):
+        """Names of the fields to render, or None for the full product."""
+        if self.request.method != 'GET':
+            return None
+        available = ProductCardSerializer.Meta.fields if self.is_card_view() else ProductSerializer.Meta.fields
+        param = self.request.query_params.get('fields')
+        if not param:
+            return list(available) if self.is_card_view() else None
+        fields = [name.strip() for name in param.split(',') if name.strip()]
+        unknown = set(fields) - set(available)
+        if unknown:
+            raise serializers.ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}"})
+        return fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.requested_fields()
+        return context
+
+    def product_queryset(self):
+        # Selects only the columns (and relations) the requested fields need
+        return Product.objects.for_serializer(self.requested_fields())
+
+    def compiled_serializer(self):
+        """The compiled serializer for this request, or None to use DRF's serializers."""
+        if not settings.FAST_SERIALIZATION_ENABLED:
+            return None
+        fields = self.requested_fields()
+        try:
+            return compile_serializer(self.get_serializer_class(), tuple(fields) if fields is not None else None)
+        except NotCompilable:
+            return None
 
-class ProductListCreateView(generics.ListCreateAPIView):
+    def list(self, request, *args, **kwargs):
+        # Read-only fast path: render value rows without model or serializer instances
+        compiled = self.compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = compiled.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compiled.serialize(page))
+        return Response(compiled.serialize(rows))
+
+
+@conditional_get(catalog_etag)
+class ProductListCreateView(ProductRepresentationMixin, generics.ListCreateAPIView):
     serializer_class = ProductSerializer
 
     def get_queryset(self):
-        queryset = Product.objects.all()
-        
-        # Handle Search
-        search_query = self.request.query_params.get('search', None)
-        if search_query:
-            from django.db.models import Q
-            words = search_query.split()
-            
-            # Smart category synonyms mapped to Category enum
-            synonyms = {
-                # Snacks & Sweets
-                'snack': ['Snacks', 'Sweets', 'Dry fruits', 'Veg starters', 'Non Veg starters', 'chat', 'namkeen', 'chips', 'biscuit', 'cookies', 'mixture', 'bhujia', 'mathri'],
-                'sweet': ['Sweets', 'Desserts', 'mithai', 'halwa', 'ladoo', 'barfi', 'pedha', 'jalebi', 'gulab jamun', 'rasgulla', 'chikki'],
-                'dessert': ['Sweets', 'Desserts', 'ice cream', 'cake', 'pastry'],
-                
-                # Vegetables & Fruits
-                'veg': ['Vegetables', 'Veg starters', 'Veg thali', 'Pulao', 'greens', 'sabzi', 'tarkari'],
-                'vegetable': ['Vegetables', 'Veg starters', 'Veg thali', 'Pulao', 'greens', 'sabzi', 'tarkari'],
-                'fruit': ['Fruits', 'Dry fruits', 'phal', 'fresh fruit'],
-                'dry fruit': ['Dry fruits', 'nuts', 'badam', 'kaju', 'pista', 'kismis', 'almond', 'cashew', 'raisin', 'walnut', 'dates'],
-                'nut': ['Dry fruits', 'nuts', 'badam', 'kaju', 'pista', 'kismis', 'almond', 'cashew', 'raisin', 'walnut', 'dates'],
-                
-                # Meat & Non-Veg
-                'nonveg': ['Non Veg starters', 'Non veg Thali', 'Biryani', 'meat', 'chicken', 'mutton', 'fish', 'egg', 'seafood'],
-                'meat': ['Non Veg starters', 'Non veg Thali', 'Biryani', 'chicken', 'mutton', 'fish', 'egg', 'seafood'],
-                'chicken': ['Non Veg starters', 'Non veg Thali', 'Biryani', 'poultry', 'murgh'],
-                'mutton': ['Non Veg starters', 'Non veg Thali', 'Biryani', 'lamb', 'goat', 'gosht'],
-                'fish': ['Non Veg starters', 'Non veg Thali', 'Biryani', 'seafood', 'prawn', 'crab', 'machli'],
-                'egg': ['Non Veg starters', 'Non veg Thali', 'Biryani', 'anda'],
-
-                # Drinks & Beverages
-                'drink': ['Drinks', 'Tea Powders', 'beverage', 'juice', 'soda', 'cool drink', 'water', 'lassi', 'buttermilk', 'chai', 'coffee'],
-                'beverage': ['Drinks', 'Tea Powders', 'juice', 'soda', 'cool drink', 'water', 'lassi', 'buttermilk', 'chai', 'coffee'],
-                'tea': ['Drinks', 'Tea Powders', 'chai', 'green tea', 'black tea'],
-                'coffee': ['Drinks', 'Tea Powders', 'filter coffee', 'instant coffee'],
-
-                # Groceries (Staples)
-                'grocery': ['Grains', 'Pulses', 'Flours', 'Rice', 'Oils', 'Spices', 'Millets', 'staple', 'pantry', 'kirana', 'provisions'],
-                'staple': ['Grains', 'Pulses', 'Flours', 'Rice', 'Oils', 'Spices', 'Millets', 'pantry', 'kirana', 'provisions'],
-                'grain': ['Grains', 'Rice', 'Millets', 'wheat', 'gehu', 'jowar', 'bajra', 'oats'],
-                'pulse': ['Pulses', 'dal', 'dhal', 'lentil', 'chana', 'moong', 'toor', 'urad', 'masoor', 'rajma', 'chole', 'lobia', 'peas', 'beans', 'gram'],
-                'dal': ['Pulses', 'dhal', 'lentil', 'chana', 'moong', 'toor', 'urad', 'masoor', 'rajma', 'chole'],
-                'lentil': ['Pulses', 'dal', 'dhal', 'chana', 'moong', 'toor', 'urad', 'masoor', 'rajma', 'chole'],
-                'flour': ['Flours', 'atta', 'maida', 'besan', 'sooji', 'rawa', 'wheat flour', 'rice flour', 'corn flour'],
-                'atta': ['Flours', 'wheat flour'],
-                'rice': ['Rice', 'chawal', 'basmati', 'sona masuri', 'raw rice', 'boiled rice', 'brown rice', 'poha', 'murmure'],
-                'oil': ['Oils', 'tel', 'cooking oil', 'sunflower oil', 'groundnut oil', 'mustard oil', 'coconut oil', 'sesame oil', 'ghee'],
-                'ghee': ['Oils', 'Dairy', 'clarified butter'],
-                'spice': ['Spices', 'masala', 'mirchi', 'haldi', 'dhaniya', 'jeera', 'mustard seeds', 'rai', 'methi', 'elaichi', 'clove', 'cinnamon', 'pepper', 'garam masala'],
-                'masala': ['Spices', 'spice', 'mirchi', 'haldi', 'dhaniya', 'jeera', 'mustard seeds', 'rai', 'methi', 'elaichi', 'clove', 'cinnamon', 'pepper', 'garam masala'],
-                'millet': ['Millets', 'ragi', 'jowar', 'bajra', 'foxtail', 'little millet', 'barnyard millet', 'kodo millet', 'proso millet', 'siridhanya'],
-                
-                # Dairy
-                'dairy': ['Dairy', 'milk', 'dudh', 'curd', 'dahi', 'yogurt', 'paneer', 'cheese', 'butter', 'makhan', 'ghee', 'cream'],
-                'milk': ['Dairy', 'dudh'],
-                'curd': ['Dairy', 'dahi', 'yogurt'],
-                'paneer': ['Dairy', 'cottage cheese'],
-
-                # Meals (Prepared Food)
-                'dinner': ['Thali', 'Veg thali', 'Non veg Thali', 'Biryani', 'Pulao', 'meal', 'bhojan'],
-                'lunch': ['Thali', 'Veg thali', 'Non veg Thali', 'Biryani', 'Pulao', 'meal', 'bhojan'],
-                'thali': ['Thali', 'Veg thali', 'Non veg Thali', 'meal', 'bhojan'],
-                'breakfast': ['Tiffins', 'nasta', 'nashta', 'morning meal'],
-                'tiffin': ['Tiffins', 'breakfast', 'nasta', 'nashta', 'morning meal', 'idli', 'dosa', 'vada', 'upma', 'poori'],
-                'starter': ['Veg starters', 'Non Veg starters', 'appetizer', 'snack', 'kebab', 'tikka', 'pakoda', 'samosa'],
-                
-                # Broad/Catch-all terms
-                'food': ['Fruits', 'Vegetables', 'Dairy', 'Grains', 'Spices', 'Veg starters', 'Non Veg starters', 'Biryani', 'Pulao', 'Veg thali', 'Non veg Thali', 'Sweets', 'Snacks', 'Dry fruits', 'Tiffins', 'Desserts', 'Millets', 'Pulses', 'Flours', 'Rice', 'Oils'],
-                'item': ['Others'],
-                'other': ['Others']
-            }
-            
-            for word in words:
-                word_lower = word.lower()
-                
-                # Basic stemming (remove trailing s)
-                stemmed_word = word_lower
-                if word_lower.endswith('ies') and len(word_lower) > 4:
-                    stemmed_word = word_lower[:-3] + 'y'
-                elif word_lower.endswith('es') and len(word_lower) > 3:
-                    stemmed_word = word_lower[:-2]
-                elif word_lower.endswith('s') and len(word_lower) > 2:
-                    stemmed_word = word_lower[:-1]
-                
-                # Check for category synonyms
-                related_cats = []
-                for key, cats in synonyms.items():
-                    if key in word_lower or key in stemmed_word:
-                        related_cats.extend(cats)
-                
-                # Build query condition for this word
-                word_q = Q(name__icontains=word) | Q(description__icontains=word) | Q(category__icontains=word)
-                if word_lower != stemmed_word:
-                    word_q |= Q(name__icontains=stemmed_word) | Q(description__icontains=stemmed_word) | Q(category__icontains=stemmed_word)
-                
-                for cat in related_cats:
-                    word_q |= Q(category__icontains=cat)
-                    
-                queryset = queryset.filter(word_q)
-
-        # Handle Ordering
-        ordering = self.request.query_params.get('ordering', '-created_at')
-        if ordering in ['-rating_count', '-average_rating', 'price', '-price', '-created_at']:
-            queryset = queryset.order_by(ordering)
+        # Structured filters (category, price range, vendor, rating, stock)
+        queryset = filter_products(self.product_queryset(), self.request.query_params)
+        ordering = self.request.query_params.get('ordering', None)
+
+        # Handle Ordering (searches are ordered by their result ids, see list())
+        return order_products(queryset, ordering)
+
+    def list(self, request, *args, **kwargs):
+        search_query = request.query_params.get('search', None)
+        if not search_query:
+            return super().list(request, *args, **kwargs)
+
+        # Handle Search: ids served from the search result cache, then only the
+        # products of the requested page are loaded
+        params = request.query_params
+        product_ids = cached_search_ids(search_query, params.get('search_mode', None), params.get('ordering', None))
+        queryset = filter_products(self.product_queryset(), params)
+        compiled = self.compiled_serializer()
+        if compiled is not None:
+            queryset, serialize = compiled.values(queryset), compiled.serialize
         else:
-            queryset = queryset.order_by('-created_at')
-            
-        return queryset
+            serialize = lambda rows: self.get_serializer(rows, many=True).data
+
+        fetch = partial(ranked_rows, queryset, product_ids)
+        page = self.paginator.paginate_ranked(fetch, request)
+        if page is not None:
+            return self.get_paginated_response(serialize(page))
+        return Response(serialize([row for _, row in fetch()]))
 
     def create(self, request, *args, **kwargs):
         # Expecting 'vendor_id' in data for now since we trust local usage, 
@@ -141,17 +128,36 @@ class ProductListCreateView(generics.ListCreateAPIView):
         # Return full serialized data including images
         return Response(ProductSerializer(product).data, status=status.HTTP_201_CREATED, headers=headers)
 
-class VendorProductListView(generics.ListAPIView):
+class ProductSuggestView(APIView):
+    """Typeahead suggestions (product names, categories, keywords) for a prefix."""
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            limit = DEFAULT_LIMIT
+        suggestions = suggestion_index.suggest(query, limit)
+        return Response({
+            'query': query,
+            'suggestions': [{'text': text, 'type': kind} for text, kind in suggestions],
+        })
+
+@conditional_get(catalog_etag)
+class VendorProductListView(ProductRepresentationMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
 
     def get_queryset(self):
         vendor_id = self.kwargs['vendor_id']
-        return Product.objects.filter(vendor_id=vendor_id).order_by('-created_at')
+        return self.product_queryset().filter(vendor_id=vendor_id).order_by('-created_at')
 
-class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Product.objects.all()
+@conditional_get(catalog_etag)
+class ProductDetailView(ProductRepresentationMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ProductSerializer
 
+    def get_queryset(self):
+        return self.product_queryset()
+
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
@@ -189,7 +195,7 @@ class ProductReviewListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         product_id = self.kwargs['product_id']
-        return ProductReview.objects.filter(product_id=product_id).order_by('-created_at')
+        return ProductReview.objects.select_related('user').filter(product_id=product_id).order_by('-created_at')
 
     def perform_create(self, serializer):
         product_id = self.kwargs['product_id']
@@ -205,15 +211,17 @@ class ProductReviewListCreateView(generics.ListCreateAPIView):
         serializer.save(product=product, user=user)
 
 class ProductReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = ProductReview.objects.all()
+    queryset = ProductReview.objects.select_related('user')
     serializer_class = ProductReviewSerializer
 
+@conditional_get(banner_etag, banner_last_modified)
 class AutoScrollImageListView(generics.ListAPIView):
     serializer_class = AutoScrollImageSerializer
     permission_classes = [permissions.AllowAny] # Anyone can see the banners
 
-    def get_queryset(self):
-        return AutoScrollImage.objects.filter(is_active=True).order_by('order')
+    def list(self, request, *args, **kwargs):
+        # Served from the in-memory feed; ?placement=home limits it to one placement
+        return Response(banner_feed.get(request.query_params.get('placement') or None))
 
 
 # Wishlist Views
@@ -241,10 +249,15 @@ class WishlistCheckView(APIView):
          exists = WishlistItem.objects.filter(user_id=user_id, product_id=product_id).exists()
          return Response({'is_wishlisted': exists})
 
-class WishlistListView(generics.ListAPIView):
+class WishlistListView(ProductRepresentationMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
 
     def get_queryset(self):
          user_id = self.kwargs['user_id']
-         # Get all products that this user has wishlisted
-         return Product.objects.filter(wishlisted_by__user_id=user_id).order_by('-wishlisted_by__added_at')
+         # Get all products that this user has wishlisted (added_at is the pagination key)
+         return (
+             self.product_queryset()
+             .filter(wishlisted_by__user_id=user_id)
+             .annotate(added_at=F('wishlisted_by__added_at'))
+             .order_by('-added_at')
+         )
@@ -0,0 +1,187 @@
+"""
+Read-only fast path for DRF model serializers.
+
+``CompiledSerializer(serializer)`` walks a ModelSerializer's fields once and
+turns them into a list of ``values()`` columns plus a converter per field,
+so rendering a list builds plain dicts from value rows instead of model
+instances, and never instantiates serializers or fields per row. The output
+is the same as ``serializer(many=True).data``: same keys in the same order,
+decimals quantized to strings, datetimes in ISO 8601 with a ``Z`` suffix.
+
+Nested serializers are supported for reverse foreign keys (``many=True``,
+one extra query per relation for the whole list) and forward foreign keys
+(one query per relation). A SerializerMethodField is read from a queryset
+annotation of the same name. A field computed by the model (a property) is
+read from the expression given for it in the serializer's
+``Meta.annotations``. Anything else raises ``NotCompilable`` at compile
+time.
+"""
+import decimal
+from collections import defaultdict
+from functools import lru_cache
+
+from django.db.models import ForeignKey, ManyToOneRel
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.settings import api_settings
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def _decimal_converter(field):
+    if not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING) or field.localize:
+        return field.to_representation
+    if field.decimal_places is None:
+        return lambda value: '{:f}'.format(value if isinstance(value, decimal.Decimal) else decimal.Decimal(str(value).strip()))
+
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+
+    def convert(value):
+        if not value:
+            return None
+        value = field.enforce_timezone(value).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _converter(field):
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if type(field) in (serializers.ReadOnlyField, serializers.IntegerField, serializers.BooleanField, serializers.CharField):
+        # Database values already have the output type
+        return None
+    return field.to_representation
+
+
+class CompiledSerializer:
+    def __init__(self, serializer):
+        self.model = serializer.Meta.model
+        opts = self.model._meta
+        self.pk_column = opts.pk.attname
+        self.columns = [self.pk_column]
+        self.fields = []      # (name, column, converter) or (name, None, nested)
+        self.many = []        # (name, compiled child, child's fk column)
+        self.one = []         # (name, compiled child, our fk column)
+        self.annotations = {}  # computed column -> expression
+        annotations = getattr(getattr(serializer, 'Meta', None), 'annotations', {})
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                relation = opts.get_field(field.source)
+                if not isinstance(relation, ManyToOneRel) or not isinstance(field.child, serializers.ModelSerializer):
+                    raise NotCompilable(f'{name}: only reverse foreign keys can be nested with many=True')
+                child = CompiledSerializer(field.child)
+                self.many.append((name, child, relation.field.attname))
+                self.fields.append((name, None, None))
+            elif isinstance(field, serializers.ModelSerializer):
+                relation = opts.get_field(field.source)
+                if not isinstance(relation, ForeignKey):
+                    raise NotCompilable(f'{name}: only foreign keys can be nested')
+                self.one.append((name, CompiledSerializer(field), relation.attname))
+                self._add_column(relation.attname)
+                self.fields.append((name, None, None))
+            elif isinstance(field, serializers.SerializerMethodField):
+                # Must be provided as an annotation of the same name
+                self._add_column(name)
+                self.fields.append((name, name, None))
+            elif isinstance(field, PrimaryKeyRelatedField):
+                column = opts.get_field(field.source).attname
+                self._add_column(column)
+                self.fields.append((name, column, None))
+            elif isinstance(field, serializers.Serializer) or '*' in field.source_attrs:
+                raise NotCompilable(f'{name}: unsupported field {type(field).__name__}')
+            else:
+                column = '__'.join(field.source_attrs)
+                if column == 'pk':
+                    column = self.pk_column
+                if column in annotations:
+                    self.annotations[column] = annotations[column]
+                self._add_column(column)
+                self.fields.append((name, column, _converter(field)))
+
+    def _add_column(self, column):
+        if column not in self.columns:
+            self.columns.append(column)
+
+    def values(self, queryset, *extra):
+        """The value rows to pass to ``serialize()``.
+
+        Annotations and ordering columns are kept in the rows, so keyset
+        pagination can read its cursor values from them.
+        """
+        queryset = queryset.annotate(**{
+            name: expression for name, expression in self.annotations.items() if name not in queryset.query.annotations
+        })
+        keys = [*queryset.query.annotations, *(key.lstrip('-') for key in queryset.query.order_by if isinstance(key, str))]
+        keys = [key for key in dict.fromkeys([*keys, *extra]) if key not in self.columns and key != 'pk']
+        return queryset.prefetch_related(None).values(*self.columns, *keys)
+
+    def serialize(self, rows):
+        rows = list(rows)
+        nested = {}
+        for name, child, fk_column in self.many:
+            ids = [row[self.pk_column] for row in rows]
+            groups = defaultdict(list)
+            if ids:
+                child_rows = list(child.values(
+                    child.model._default_manager.filter(**{f'{fk_column}__in': ids}).order_by('pk'), fk_column,
+                ))
+                for child_row, data in zip(child_rows, child.serialize(child_rows)):
+                    groups[child_row[fk_column]].append(data)
+            nested[name] = groups
+        for name, child, fk_column in self.one:
+            ids = {row[fk_column] for row in rows if row[fk_column] is not None}
+            related = {}
+            if ids:
+                child_rows = list(child.values(child.model._default_manager.filter(pk__in=ids)))
+                related = {child_row[child.pk_column]: data for child_row, data in zip(child_rows, child.serialize(child_rows))}
+            nested[name] = (fk_column, related)
+
+        many_names = {name for name, _, _ in self.many}
+        output = []
+        for row in rows:
+            data = {}
+            for name, column, convert in self.fields:
+                if column is None:
+                    if name in many_names:
+                        data[name] = nested[name].get(row[self.pk_column], [])
+                    else:
+                        fk_column, related = nested[name]
+                        data[name] = related.get(row[fk_column])
+                    continue
+                value = row[column]
+                data[name] = value if value is None or convert is None else convert(value)
+            output.append(data)
+        return output
+
+
+@lru_cache(maxsize=64)
+def compile_serializer(serializer_class, fields=None):
+    """Compiled form of ``serializer_class`` (limited to ``fields`` for sparse field sets)."""
+    context = {'fields': list(fields)} if fields is not None else {}
+    return CompiledSerializer(serializer_class(context=context))
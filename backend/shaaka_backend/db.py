@@ -0,0 +1,23 @@
+"""
+Database helpers shared by the test runner and management commands.
+
+`UserProfile` and `AutoScrollImage` live in tables created outside Django
+(managed = False), so migrations never create them in a fresh database.
+"""
+from django.apps import apps
+from django.db import connections
+
+
+def create_unmanaged_tables(using='default', **kwargs):
+    """Create any missing table backing an unmanaged model."""
+    connection = connections[using]
+    existing = set(connection.introspection.table_names())
+    missing = {
+        model._meta.db_table: model for model in apps.get_models()
+        if not model._meta.managed and model._meta.db_table not in existing
+    }
+    if not missing:
+        return
+    with connection.schema_editor() as schema_editor:
+        for model in missing.values():
+            schema_editor.create_model(model)
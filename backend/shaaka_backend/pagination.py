@@ -0,0 +1,176 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Opt-in: a list is paginated only when the request passes ``cursor`` or
+``limit``, so existing clients that expect a plain JSON array keep getting
+one. New endpoints set ``opt_in = False`` to always paginate. Paginated
+responses look like ``{"next": <url or null>, "results": [...]}``.
+
+The cursor holds the sort key values of the last row of the page and the
+next page is fetched with ``WHERE (key) > (last key) ... LIMIT n``, which
+an index on the sort key serves directly, so deep pages cost the same as
+the first one. The queryset's ordering is the key (its fields or
+annotations, which must be attributes or keys of the returned rows); the primary
+key is appended as a tie-breaker.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+MAX_LIMIT = 100
+
+
+def _encode_value(value):
+    # Full precision: DjangoJSONEncoder drops microseconds from datetimes
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    invalid_cursor_message = 'Invalid cursor'
+    opt_in = True
+    next_cursor = None
+
+    def is_paginated(self, request):
+        params = request.query_params
+        return not self.opt_in or self.cursor_query_param in params or self.limit_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_paginated(request):
+            return None
+
+        params = request.query_params
+
+        self.base_url = request.build_absolute_uri()
+        self.limit = self.get_limit(request)
+        self.keys = self.get_keys(queryset)
+        queryset = queryset.order_by(*self.keys)
+
+        encoded = params.get(self.cursor_query_param)
+        if encoded:
+            try:
+                queryset = queryset.filter(self.after(self.decode_cursor(encoded)))
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset[:self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        self.page = rows[:self.limit]
+        return self.page
+
+    def paginate_ranked(self, fetch, request):
+        """Paginate a list ranked outside the database, e.g. cached search result ids.
+
+        ``fetch(start, count)`` returns up to ``count`` ``(position, row)``
+        pairs from position ``start`` of the ranking on; the cursor is the
+        position after the page.
+        """
+        if not self.is_paginated(request):
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.limit = self.get_limit(request)
+        start = 0
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            values = self.decode_cursor(encoded)
+            if len(values) != 1 or type(values[0]) is not int or values[0] < 0:
+                raise NotFound(self.invalid_cursor_message)
+            start = values[0]
+
+        rows = fetch(start, self.limit + 1)
+        self.has_next = len(rows) > self.limit
+        self.page = [row for _, row in rows[:self.limit]]
+        if self.has_next:
+            self.next_cursor = self.encode_values([rows[self.limit - 1][0] + 1])
+        return self.page
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE or 20
+        return min(max(limit, 1), MAX_LIMIT)
+
+    def get_keys(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not all(isinstance(field, str) and field != '?' for field in ordering):
+            # Expression ordering cannot be resumed from a cursor
+            ordering = []
+        pk_name = queryset.model._meta.pk.name
+        if not ordering:
+            return ['-' + pk_name]
+        if ordering[-1].lstrip('-') not in ('pk', pk_name):
+            ordering.append(('-' if ordering[0].startswith('-') else '') + pk_name)
+        return ordering
+
+    def after(self, values):
+        """``(keys) > (values)`` in sort order, with a range on the leading key."""
+        if len(values) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        for position in reversed(range(len(self.keys))):
+            field = self.keys[position].lstrip('-')
+            op = 'lt' if self.keys[position].startswith('-') else 'gt'
+            term = Q(**{f'{field}__{op}': values[position]})
+            if position < len(self.keys) - 1:
+                term |= Q(**{field: values[position]}) & condition
+            condition = term
+
+        # Redundant but sargable: lets the planner range-scan the leading column
+        leading = self.keys[0].lstrip('-')
+        op = 'lte' if self.keys[0].startswith('-') else 'gte'
+        return Q(**{f'{leading}__{op}': values[0]}) & condition
+
+    def encode_cursor(self, row):
+        # Rows are model instances, or dicts from a values() queryset
+        get = row.__getitem__ if isinstance(row, dict) else partial(getattr, row)
+        return self.encode_values([_encode_value(get(key.lstrip('-'))) for key in self.keys])
+
+    def encode_values(self, values):
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, encoded):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+        except (binascii.Error, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        cursor = self.next_cursor or self.encode_cursor(self.page[-1])
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
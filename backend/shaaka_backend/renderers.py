@@ -0,0 +1,100 @@
+"""
+msgspec-backed JSON and MessagePack renderers and parsers.
+
+``JSONRenderer``/``JSONParser`` are drop-in replacements for DRF's that
+encode and decode with msgspec, which handles Decimal, datetime, UUID and
+the container types serializers return in C instead of through a Python
+``default`` hook. The output matches DRF's compact JSON for serializer data;
+raw datetimes keep their microseconds (DRF truncates them to milliseconds).
+Requests asking for an indented response fall back to DRF's renderer.
+
+``MessagePackRenderer``/``MessagePackParser`` serve ``application/msgpack``
+(``Accept`` header or ``?format=msgpack``) with the same data types.
+
+msgspec is optional: without it the JSON classes behave exactly like DRF's
+and the MessagePack classes are left out of the settings.
+"""
+from functools import lru_cache
+
+from django.utils.functional import Promise
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.settings import api_settings
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover
+    msgspec = None
+
+
+def _enc_hook(obj):
+    # Lazy translations, ErrorDetail and other str-likes; anything else is a bug
+    if isinstance(obj, (str, Promise)):
+        return str(obj)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not serializable')
+
+
+@lru_cache(maxsize=None)
+def _encoder(module, decimal_format):
+    return module.Encoder(enc_hook=_enc_hook, decimal_format=decimal_format)
+
+
+def _encode(module, data):
+    decimal_format = 'string' if api_settings.COERCE_DECIMAL_TO_STRING else 'number'
+    return _encoder(module, decimal_format).encode(data)
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            msgspec is None
+            or data is None
+            or not api_settings.UNICODE_JSON
+            or not api_settings.COMPACT_JSON
+            or self.get_indent(accepted_media_type or '', renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = _encode(msgspec.json, data)
+        # Like DRF: U+2028/U+2029 are valid JSON but not valid JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class JSONParser(parsers.JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        if msgspec is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        try:
+            body = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                body = body.decode(encoding).encode()
+            return msgspec.json.decode(body)
+        except (msgspec.DecodeError, UnicodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return _encode(msgspec.msgpack, data)
+
+
+class MessagePackParser(parsers.BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgspec.msgpack.decode(stream.read())
+        except msgspec.DecodeError as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
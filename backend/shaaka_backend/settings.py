@@ -5,6 +5,7 @@ Django settings for shaaka_backend project.
 from pathlib import Path
 from decouple import config
 import dj_database_url
+import importlib.util
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'cloudinary',
@@ -47,6 +49,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    # Compresses API responses; must run after (be listed before) anything reading the body
+    'django.middleware.gzip.GZipMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,6 +80,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'shaaka_backend.wsgi.application'
 
+TEST_RUNNER = 'shaaka_backend.test_runner.ShaakaTestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -89,6 +95,32 @@ DATABASES = {
 }
 
 
+# Cache
+# Local development uses the per-process locmem cache. Production must use a
+# cache shared by all gunicorn workers so the catalog version counters
+# (products/catalog.py) are seen by every worker; with DEBUG off a
+# process-local default cache is logged as a warning at startup. E.g.
+#   CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache
+#   CACHE_LOCATION=django_cache   (then run `python manage.py createcachetable`)
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='shaaka'),
+    },
+    # Product search results (ordered id lists), see products/search_cache.py.
+    # Size-bounded (least recently used entries are culled first) with a TTL.
+    'search': {
+        'BACKEND': config('SEARCH_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('SEARCH_CACHE_LOCATION', default='shaaka-search'),
+        'TIMEOUT': config('SEARCH_CACHE_TIMEOUT', default=300, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('SEARCH_CACHE_MAX_ENTRIES', default=5000, cast=int),
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -151,8 +183,62 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Opt-in keyset pagination: only applied when a request passes ?limit= or ?cursor=
+    'DEFAULT_PAGINATION_CLASS': 'shaaka_backend.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+    # msgspec-backed JSON (falls back to stdlib json when msgspec is missing)
+    'DEFAULT_RENDERER_CLASSES': [
+        'shaaka_backend.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'shaaka_backend.renderers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# application/msgpack responses (Accept header or ?format=msgpack) and request bodies
+if importlib.util.find_spec('msgspec'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('shaaka_backend.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('shaaka_backend.renderers.MessagePackParser')
+
+# Product search backend for /api/products/?search=
+# 'fulltext' uses the Postgres tsvector column + GIN index (falls back to 'basic' on other databases)
+# 'fuzzy' uses pg_trgm word similarity on product names (typo tolerant)
+# 'memory' uses a per-worker in-memory inverted index (products/search_index.py)
+# 'basic' uses icontains OR-chains
+# Clients can pick a backend per request with ?search_mode=
+PRODUCT_SEARCH_BACKEND = config('PRODUCT_SEARCH_BACKEND', default='fulltext')
+PRODUCT_SEARCH_TRIGRAM_THRESHOLD = config('PRODUCT_SEARCH_TRIGRAM_THRESHOLD', default=0.4, cast=float)
+PRODUCT_SEARCH_CACHE_ENABLED = config('PRODUCT_SEARCH_CACHE_ENABLED', default=True, cast=bool)
+# Matches kept per search (and per search cache entry), best first
+PRODUCT_SEARCH_MAX_RESULTS = config('PRODUCT_SEARCH_MAX_RESULTS', default=1000, cast=int)
+
+# Product and order lists render straight from values() rows through a
+# serializer compiled once per field set (shaaka_backend/compiled_serializers.py).
+FAST_SERIALIZATION_ENABLED = config('FAST_SERIALIZATION_ENABLED', default=True, cast=bool)
+
+# Product and banner GETs carry an ETag and answer If-None-Match with 304
+# (products/conditional.py). Seconds clients may reuse a response before revalidating.
+CATALOG_CACHE_MAX_AGE = config('CATALOG_CACHE_MAX_AGE', default=0, cast=int)
+
+# Banners are served from a per-worker feed (products/banners.py); seconds
+# before it probes auto_scroll_images for changes.
+BANNER_FEED_TTL_SECONDS = config('BANNER_FEED_TTL_SECONDS', default=30, cast=float)
+
+# Adding to a cart holds the stock (orders/reservations.py) for this many
+# seconds after the cart last changed; release_expired_reservations frees it.
+CART_RESERVATION_TTL_SECONDS = config('CART_RESERVATION_TTL_SECONDS', default=900, cast=int)
+
+# Responses to order requests sent with an Idempotency-Key (orders/idempotency.py)
+# are replayed to retries for this long; purge_idempotency_keys deletes them after.
+IDEMPOTENCY_KEY_TTL_SECONDS = config('IDEMPOTENCY_KEY_TTL_SECONDS', default=86400, cast=int)
+
+# /api/products/suggest/ serves from a per-worker prefix index (products/suggest.py).
+# Seconds between checks for catalog changes made by other workers.
+PRODUCT_SUGGEST_REFRESH_SECONDS = config('PRODUCT_SUGGEST_REFRESH_SECONDS', default=5, cast=float)
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Shaaka API',
     'DESCRIPTION': 'Documentation for Shaaka Backend API',
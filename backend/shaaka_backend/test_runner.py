@@ -0,0 +1,20 @@
+"""
+Test runner that also creates tables for unmanaged models.
+
+`UserProfile` and `AutoScrollImage` live in tables created outside Django
+(managed = False), so migrations never create them in the test database.
+"""
+from django.db.models.signals import pre_migrate
+from django.test.runner import DiscoverRunner
+
+from .db import create_unmanaged_tables
+
+
+class ShaakaTestRunner(DiscoverRunner):
+    def setup_databases(self, **kwargs):
+        # Must run before the first migration that references these tables
+        pre_migrate.connect(create_unmanaged_tables, dispatch_uid='create_unmanaged_tables')
+        try:
+            return super().setup_databases(**kwargs)
+        finally:
+            pre_migrate.disconnect(dispatch_uid='create_unmanaged_tables')
@@ -15,3 +15,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shaaka_backend.settings')
 
 application = get_wsgi_application()
 
+# Build the in-memory catalog search index once per worker (no-op unless the
+# 'memory' search backend is enabled).
+from products.search_index import warm_up  # noqa: E402
+
+warm_up()
+